@@ -0,0 +1,491 @@
+#!/usr/bin/env python
+
+#Benchmark_Import_Reg.py
+#Python 3.X
+#Benchmarks for Import_Reg_Public.py. 
+#Arguments: 
+	#Benchmark - optional - which benchmark to run:
+		#format - entries/sec of FormatAIRegEntry, compared with the legacy replace chain. This is the default.
+		#memory - tracemalloc peaks of parsing a registry file and inserting it into an AI project file.
+		#binary - MB/sec of formatting large hex:, hex(2): and hex(7): values, compared with the legacy replace chain.
+		#rows - ROWs/sec of WriteRegistryRows compared with the legacy template replace (test_Import_Reg.py checks the ROWs).
+		#suite - time, throughput and peak memory of every stage of an import, as JSON. See "BenchmarkSuite".
+		#corpus - write the synthetic registry file and AI project file to a directory, without running anything.
+	#Count - optional - the number of registry values in the synthetic corpus. Defaults to 1000000.
+		#For the binary benchmark, this is the size in bytes of each value.
+	#ProjectRows - optional - suite and corpus only - the number of ROWs already in the AI project file. The suite takes a comma separated list. 
+	#Directory - optional - corpus only - where to write the files. Defaults to the current directory.
+#Example: Benchmark_Import_Reg.py memory 1000000
+#Example: Benchmark_Import_Reg.py binary 8000000
+#Example: Benchmark_Import_Reg.py suite 100000 1000,1000000 >results.json
+#Notes:
+#The corpus is generated with a fixed seed, so results can be compared between versions of the import script.
+
+
+import sys
+import os
+import re
+import time
+import random
+import binascii
+import tempfile
+import tracemalloc
+import shutil
+import json
+
+import Import_Reg_Public as ImportReg
+
+
+#The formatter as it was before the table-driven rewrite. Kept here so we can measure the difference.
+def LegacyFormatAIRegEntry(CurrentRegistryEntry, strComponentInstallDir, strPlatform):
+	
+	CurrentRegistryEntry.strValue = re.sub(r"\w:(\\\\[\w~ ]+)+(\\\\|([\w ]+(?=\")))",strComponentInstallDir, CurrentRegistryEntry.strValue)
+		
+	if (strPlatform == "32"):
+		CurrentRegistryEntry.strKey = CurrentRegistryEntry.strKey.replace("[PLATFORM]","win32")
+	elif (strPlatform == "64"):
+		CurrentRegistryEntry.strKey = CurrentRegistryEntry.strKey.replace("[PLATFORM]","win64")	
+	
+	CurrentRegistryEntry.strValue = CurrentRegistryEntry.strValue.replace("&","&amp;")
+	CurrentRegistryEntry.strValue = CurrentRegistryEntry.strValue.replace("\\\"","&quot;")	
+	CurrentRegistryEntry.strValue = CurrentRegistryEntry.strValue.replace("[","%temp1%")
+	CurrentRegistryEntry.strValue = CurrentRegistryEntry.strValue.replace("]","%temp2%")
+	CurrentRegistryEntry.strValue = CurrentRegistryEntry.strValue.replace("%temp1%","[\\[]")
+	CurrentRegistryEntry.strValue = CurrentRegistryEntry.strValue.replace("%temp2%","[\\]]")
+	CurrentRegistryEntry.strValue = CurrentRegistryEntry.strValue.replace("{","%temp1%")
+	CurrentRegistryEntry.strValue = CurrentRegistryEntry.strValue.replace("}","%temp2%")
+	CurrentRegistryEntry.strValue = CurrentRegistryEntry.strValue.replace("%temp1%","[\\{]")
+	CurrentRegistryEntry.strValue = CurrentRegistryEntry.strValue.replace("%temp2%","[\\}]")
+	strComponentInstallDirTemp = strComponentInstallDir.strip('[]')
+	CurrentRegistryEntry.strValue = CurrentRegistryEntry.strValue.replace("[\\[]"+strComponentInstallDirTemp+"[\\]]", "["+strComponentInstallDirTemp+"]")
+	
+	if (CurrentRegistryEntry.strValue.startswith("hex:")):
+		strTemp = CurrentRegistryEntry.strValue.replace("hex:", "")
+		strTemp = strTemp.replace(",", "")
+		CurrentRegistryEntry.strValue = "#x" + strTemp
+		
+	if (CurrentRegistryEntry.strValue.startswith("dword:")):
+		strTemp = CurrentRegistryEntry.strValue.replace("dword:", "")
+		i = int(strTemp, 16)
+		CurrentRegistryEntry.strValue = "#" + str(i)	
+		
+	if (CurrentRegistryEntry.strValue.startswith("hex(2):")):
+		strTemp = CurrentRegistryEntry.strValue.replace("hex(2):", "")		
+		strTemp = strTemp.replace(",00", "")
+		strTemp = strTemp.replace(",", "")
+		CurrentRegistryEntry.strValue = "#%" + binascii.unhexlify(strTemp).decode('utf-8')
+		
+	if (CurrentRegistryEntry.strValue.startswith("hex(7):")):
+		strTemp = CurrentRegistryEntry.strValue.replace("hex(7):", "")
+		strTemp = strTemp.replace(",00,00,00", "0A")
+		strTemp = strTemp.replace(",00", "")
+		strTemp = strTemp.replace(",", "")
+		CurrentRegistryEntry.strValue = binascii.unhexlify(strTemp).decode('utf-8')
+		CurrentRegistryEntry.strValue = CurrentRegistryEntry.strValue.replace("\n", "[~]")
+	
+	if (CurrentRegistryEntry.strValue == "" and CurrentRegistryEntry.strName == ""):
+		CurrentRegistryEntry.strName = "+"
+			
+	if (strPlatform == "32"):
+		CurrentRegistryEntry.strValue = CurrentRegistryEntry.strValue.replace("\\win64]","\\win32]")
+	elif (strPlatform == "64"):
+		CurrentRegistryEntry.strValue = CurrentRegistryEntry.strValue.replace("\\win32]","\\win64]")
+
+		
+#The ROW formatter as it was before the XML writer. Kept here so we can measure the difference.
+def LegacyFormatRegistryObject(i):
+
+	strRegistryXMLEntry = "<ROW Registry=[%1] Root=[%2] Key=[%3][%4][%5] Component_=[%6]/>"
+	
+	strRegistryXMLEntryTemp = strRegistryXMLEntry;
+	strRegistryXMLEntryTemp = strRegistryXMLEntryTemp.replace("[%1]", "\""+i.strRegistry+"\"")
+	strRegistryXMLEntryTemp = strRegistryXMLEntryTemp.replace("[%2]", "\""+str(i.strRoot)+"\"")
+	strRegistryXMLEntryTemp = strRegistryXMLEntryTemp.replace("[%3]", "\""+i.strKey+"\"")
+	if(i.strName != "" ):
+		strRegistryXMLEntryTemp = strRegistryXMLEntryTemp.replace("[%4]"," Name="+"\""+i.strName+"\"")
+	else:
+		strRegistryXMLEntryTemp = strRegistryXMLEntryTemp.replace("[%4]","")
+	if(i.strName != "+"):
+		strRegistryXMLEntryTemp = strRegistryXMLEntryTemp.replace("[%5]"," Value="+"\""+i.strValue+"\"")
+	else:
+		strRegistryXMLEntryTemp = strRegistryXMLEntryTemp.replace("[%5]","")
+	strRegistryXMLEntryTemp = strRegistryXMLEntryTemp.replace("[%6]", "\""+i.strComponent+"\"")	
+			
+	return strRegistryXMLEntryTemp
+
+	
+#Format bytes the way regedit exports them. Ex: "01,02,ff"
+def HexList(data):
+	return ",".join("%02x" % b for b in data)
+
+	
+#Generate a GUID-looking string from the random generator, so the corpus is the same every run.
+def RandomGuid(rand):
+	return "{%08X-%04X-%04X-%04X-%012X}" % (rand.getrandbits(32), rand.getrandbits(16), rand.getrandbits(16), rand.getrandbits(16), rand.getrandbits(48))
+
+	
+#Generate (key, name, value) tuples, as they come out of GetRegKey, GetRegName and GetRegValue.
+#The mix of value types is roughly what we see in COM registration exports.
+def GenerateValueCorpus(iCount, iSeed=1):
+	
+	rand = random.Random(iSeed)
+	lstCorpus = []
+	for i in range(iCount):
+		strGuid = RandomGuid(rand)
+		strKey = "CLSID\\" + strGuid + "\\InprocServer32"
+		iType = rand.randrange(100)
+		if iType < 30:
+			lstCorpus.append((strKey, "AppID", strGuid))
+		elif iType < 45:
+			lstCorpus.append((strKey, "", "C:\\\\Program Files\\\\MyCompany\\\\MyProduct\\\\Module%d.dll" % i))
+		elif iType < 60:
+			lstCorpus.append((strKey, "ThreadingModel", "Apartment"))
+		elif iType < 65:
+			lstCorpus.append(("TypeLib\\" + strGuid + "\\1.0\\0\\[PLATFORM]", "", "My Type Library & \\\"Tools\\\" [%d]" % i))
+		elif iType < 80:
+			lstCorpus.append((strKey, "Flags", "dword:%08x" % rand.getrandbits(32)))
+		elif iType < 90:
+			lstCorpus.append((strKey, "Data", "hex:" + HexList(rand.getrandbits(8) for _ in range(rand.randrange(4, 64)))))
+		elif iType < 95:
+			lstCorpus.append((strKey, "Path", "hex(2):" + HexList(("%%SystemRoot%%\\System32\\Module%d.dll\0" % i).encode("utf-16le"))))
+		else:
+			lstCorpus.append((strKey, "Names", "hex(7):" + HexList(("First\0Second%d\0\0" % i).encode("utf-16le"))))
+	
+	return lstCorpus
+
+	
+#Run a formatter over the whole corpus and return the number of entries formatted per second.
+def TimeFormatter(FormatEntry, lstCorpus):
+	
+	CurrentRegistryEntry = ImportReg.RegistryEntryAI()
+	fStart = time.perf_counter()
+	for strKey, strName, strValue in lstCorpus:
+		CurrentRegistryEntry.strKey = strKey
+		CurrentRegistryEntry.strName = strName
+		CurrentRegistryEntry.strValue = strValue
+		FormatEntry(CurrentRegistryEntry)
+	fElapsed = time.perf_counter() - fStart
+	
+	return len(lstCorpus) / fElapsed
+
+	
+#Compare FormatAIRegEntry against the legacy replace chain.
+def BenchmarkFormatter(iCount):
+	
+	lstCorpus = GenerateValueCorpus(iCount)
+	strComponentInstallDir = "[APPDIR]"
+	strPlatform = "32"
+	formatSettings = ImportReg.GetRegFormatSettings("MyComponent", False, strComponentInstallDir, strPlatform)
+	
+	fBefore = TimeFormatter(lambda CurrentRegistryEntry: LegacyFormatAIRegEntry(CurrentRegistryEntry, strComponentInstallDir, strPlatform), lstCorpus)
+	fAfter = TimeFormatter(lambda CurrentRegistryEntry: ImportReg.FormatAIRegEntry(CurrentRegistryEntry, formatSettings), lstCorpus)
+	
+	print ('FormatAIRegEntry,', iCount, 'values')
+	print ('    before: %.0f entries/sec' % fBefore)
+	print ('    after:  %.0f entries/sec' % fAfter)
+	print ('    speedup: %.2fx' % (fAfter / fBefore))
+
+	
+#Format a single value a few times and return the best MB/sec, measured on the size of the value in the registry file.
+def TimeValueFormatter(FormatEntry, strKey, strName, strValue, iRepeat=3):
+	
+	fBest = None
+	CurrentRegistryEntry = ImportReg.RegistryEntryAI()
+	for i in range(iRepeat):
+		CurrentRegistryEntry.strKey = strKey
+		CurrentRegistryEntry.strName = strName
+		CurrentRegistryEntry.strValue = strValue
+		fStart = time.perf_counter()
+		FormatEntry(CurrentRegistryEntry)
+		fElapsed = time.perf_counter() - fStart
+		if fBest is None or fElapsed < fBest:
+			fBest = fElapsed
+	
+	return len(strValue) / fBest / 1e6
+
+	
+#Compare the hex:, hex(2): and hex(7): formatters against the legacy replace chain, on values of iCount bytes.
+#Type libraries and certificates are exported as hex: values of several megabytes.
+def BenchmarkBinary(iCount):
+	
+	rand = random.Random(1)
+	strComponentInstallDir = "[APPDIR]"
+	strPlatform = "32"
+	formatSettings = ImportReg.GetRegFormatSettings("MyComponent", False, strComponentInstallDir, strPlatform)
+	
+	#The legacy formatter only decodes ASCII strings correctly, so the strings are kept ASCII to compare the same work.
+	strPath = "%SystemRoot%\\System32\\Module.dll;"
+	strPaths = (strPath * (iCount // 2 // len(strPath) + 1))[:iCount // 2]
+	strNames = ("\0".join("Name%d" % i for i in range(iCount // 14 + 1)))[:iCount // 2 - 2]
+	lstValues = [
+		("hex:", "hex:" + HexList(rand.getrandbits(8 * iCount).to_bytes(iCount, "little"))),
+		("hex(2):", "hex(2):" + HexList((strPaths + "\0").encode("utf-16le"))),
+		("hex(7):", "hex(7):" + HexList((strNames.rstrip("\0") + "\0\0").encode("utf-16le"))),
+	]
+	
+	print ('Binary values,', iCount, 'bytes each')
+	for strType, strValue in lstValues:
+		fBefore = TimeValueFormatter(lambda CurrentRegistryEntry: LegacyFormatAIRegEntry(CurrentRegistryEntry, strComponentInstallDir, strPlatform), "TypeLib", "Data", strValue)
+		fAfter = TimeValueFormatter(lambda CurrentRegistryEntry: ImportReg.FormatAIRegEntry(CurrentRegistryEntry, formatSettings), "TypeLib", "Data", strValue)
+		print ('    %-8s before: %7.1f MB/sec   after: %7.1f MB/sec   speedup: %.2fx' % (strType, fBefore, fAfter, fAfter / fBefore))
+
+		
+#Format bytes the way regedit exports them in a value: 25 bytes per line, the lines ending with a "\" that continues the value on the next line.
+def WrapHexList(data):
+	data = bytes(data)
+	return ",\\\n  ".join(HexList(data[iPos:iPos + 25]) for iPos in range(0, len(data), 25))
+
+	
+#Write a registry file with about iCount values, laid out like a regedit export of COM servers.
+#Every server has a CLSID, TypeLib and Interface tree, and a settings key with every type of value the formatter handles:
+#@= defaults, dword:, hex:, hex(2): and hex(7): (long ones split over several lines with "\"), strings that need escaping, paths under the installation directory,
+#win32 keys that change with the platform, and a key without values.
+def WriteRegistryFile(strPath, iCount, iSeed=1):
+	
+	rand = random.Random(iSeed)
+	with open(strPath, "w") as regFileHandle:
+		regFileHandle.write("Windows Registry Editor Version 5.00\n\n")
+		i = 0
+		while i < iCount:
+			strClsid = RandomGuid(rand)
+			strLibId = RandomGuid(rand)
+			strIid = RandomGuid(rand)
+			strDir = "C:\\\\Program Files\\\\MyCompany\\\\MyProduct\\\\"
+			regFileHandle.write("[HKEY_CLASSES_ROOT\\CLSID\\%s]\n@=\"Module%d Class\"\n\"AppID\"=\"%s\"\n\n" % (strClsid, i, strClsid))
+			regFileHandle.write("[HKEY_CLASSES_ROOT\\CLSID\\%s\\InprocServer32]\n@=\"%sModule%d.dll\"\n\"ThreadingModel\"=\"Apartment\"\n\n" % (strClsid, strDir, i))
+			regFileHandle.write("[HKEY_CLASSES_ROOT\\CLSID\\%s\\ProgID]\n@=\"MyProduct.Module%d.1\"\n\n" % (strClsid, i))
+			regFileHandle.write("[HKEY_CLASSES_ROOT\\CLSID\\%s\\TypeLib]\n@=\"%s\"\n\n" % (strClsid, strLibId))
+			regFileHandle.write("[HKEY_CLASSES_ROOT\\CLSID\\%s\\Implemented Categories\\{7DD95801-9882-11CF-9FA9-00AA006C42C4}]\n\n" % strClsid)
+			regFileHandle.write("[HKEY_CLASSES_ROOT\\TypeLib\\%s\\1.0]\n@=\"Module%d 1.0 Type Library\"\n\n" % (strLibId, i))
+			regFileHandle.write("[HKEY_CLASSES_ROOT\\TypeLib\\%s\\1.0\\0\\win32]\n@=\"%sModule%d.tlb\"\n\n" % (strLibId, strDir, i))
+			regFileHandle.write("[HKEY_CLASSES_ROOT\\TypeLib\\%s\\1.0\\FLAGS]\n@=\"0\"\n\n" % strLibId)
+			regFileHandle.write("[HKEY_CLASSES_ROOT\\TypeLib\\%s\\1.0\\HELPDIR]\n@=\"%s\"\n\n" % (strLibId, strDir))
+			regFileHandle.write("[HKEY_CLASSES_ROOT\\Interface\\%s]\n@=\"IModule%d\"\n\n" % (strIid, i))
+			regFileHandle.write("[HKEY_CLASSES_ROOT\\Interface\\%s\\ProxyStubClsid32]\n@=\"{00020424-0000-0000-C000-000000000046}\"\n\n" % strIid)
+			regFileHandle.write("[HKEY_CLASSES_ROOT\\Interface\\%s\\TypeLib]\n@=\"%s\"\n\"Version\"=\"1.0\"\n\n" % (strIid, strLibId))
+			regFileHandle.write("[HKEY_LOCAL_MACHINE\\SOFTWARE\\MyCompany\\MyProduct\\Module%d]\n" % i)
+			regFileHandle.write("\"Flags\"=dword:%08x\n" % rand.getrandbits(32))
+			regFileHandle.write("\"Data\"=hex:%s\n" % WrapHexList(rand.getrandbits(8) for _ in range(rand.randrange(8, 200))))
+			regFileHandle.write("\"Path\"=hex(2):%s\n" % WrapHexList(("%%ProgramFiles%%\\MyCompany\\MyProduct\\Module%d.dll\0" % i).encode("utf-16le")))
+			regFileHandle.write("\"Names\"=hex(7):%s\n" % WrapHexList(("Module%d\0Module%d.1\0\0" % (i, i)).encode("utf-16le")))
+			regFileHandle.write("\"Description\"=\"Module %d & \\\"Tools\\\" [x86] {v1}\"\n\n" % i)
+			i += 20
+
+			
+#Write an AI project file with iRows ROWs in its MsiRegsComponent table, spread over 100 components that are not the one being imported.
+def WriteProjectFile(strPath, iRows=0, iSeed=2):
+	
+	rand = random.Random(iSeed)
+	with open(strPath, "w") as projectHandle:
+		projectHandle.write('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n')
+		projectHandle.write('<DOCUMENT Type="Advanced Installer" CreateVersion="12.0" version="12.0" Modules="professional" RootPath="." Language="en">\n')
+		projectHandle.write('  <COMPONENT cid="caphyon.advinst.msicomp.MsiRegsComponent">\n')
+		for i in range(iRows):
+			strGuid = RandomGuid(rand)
+			projectHandle.write('    <ROW Registry="Existing%d_%d" Root="0" Key="CLSID\\%s\\InprocServer32" Name="ThreadingModel" Value="Apartment" Component_="Existing%d"/>\n' % (i % 100, i // 100 + 1, strGuid, i % 100))
+		projectHandle.write('  </COMPONENT>\n')
+		projectHandle.write('</DOCUMENT>\n')
+
+		
+#Measure the peak memory of parsing a registry file with iCount values, and of inserting its entries into an AI project file.
+def BenchmarkMemory(iCount):
+	
+	with tempfile.TemporaryDirectory() as strTempDir:
+		strRegFilePath = os.path.join(strTempDir, "Benchmark.reg")
+		strProjectFile = os.path.join(strTempDir, "Benchmark.aip")
+		WriteRegistryFile(strRegFilePath, iCount)
+		WriteProjectFile(strProjectFile)
+		importer = ImportReg.RegistryImporter(ImportReg.RegistryImportConfig(strRegFilePath, strProjectFile, "MyComponent", False, "32", "[APPDIR]"))
+		
+		tracemalloc.start()
+		lstRegistryEntries = importer.Parse()
+		iParseCurrent, iParsePeak = tracemalloc.get_traced_memory()
+		tracemalloc.reset_peak()
+		importer.Insert(lstRegistryEntries)
+		iInsertCurrent, iInsertPeak = tracemalloc.get_traced_memory()
+		tracemalloc.stop()
+		
+		iEntries = len(lstRegistryEntries)
+		iProjectSize = os.path.getsize(strProjectFile)
+		
+	print ('Memory,', iEntries, 'entries')
+	print ('    parse peak:  %.1f MB (%.0f bytes/entry)' % (iParsePeak / 1e6, iParsePeak / iEntries))
+	print ('    insert peak: %.1f MB (%.1f MB above the parsed entries)' % (iInsertPeak / 1e6, (iInsertPeak - iParseCurrent) / 1e6))
+	print ('    project file: %.1f MB' % (iProjectSize / 1e6))
+
+	
+#Run a stage of the import once to time it, then once more under tracemalloc to measure the memory it allocates at its peak.
+#Setup runs before each run of the stage, and is not measured. Returns the time in seconds and the peak in bytes.
+def MeasureStage(RunStage, Setup=None):
+	
+	if Setup:
+		Setup()
+	fStart = time.perf_counter()
+	RunStage()
+	fSeconds = time.perf_counter() - fStart
+	
+	if Setup:
+		Setup()
+	tracemalloc.start()
+	RunStage()
+	iCurrent, iPeak = tracemalloc.get_traced_memory()
+	tracemalloc.stop()
+	
+	return fSeconds, iPeak
+
+	
+#The results of a stage, as they are reported in the JSON: time, entries/sec, MB/sec of the input (if iBytes is given), and the peak memory.
+def StageResult(tupleMeasure, iEntries, iBytes=None):
+	
+	fSeconds, iPeak = tupleMeasure
+	dictResult = {"seconds": round(fSeconds, 4), "entries_per_sec": round(iEntries / fSeconds)}
+	if iBytes is not None:
+		dictResult["mb_per_sec"] = round(iBytes / fSeconds / 1e6, 2)
+	dictResult["peak_mb"] = round(iPeak / 1e6, 2)
+	return dictResult
+
+	
+#Tokenize a registry file, and create its RegistryEntryAI objects without formatting them, so FormatAIRegEntry can be timed on its own.
+def ReadUnformattedEntries(strRegFilePath, formatSettings):
+	
+	lstRegistryEntries = []
+	with ImportReg.OpenRegistryFile(strRegFilePath) as regFileHandle:
+		ImportReg.ParseRegistryLines(regFileHandle, [(formatSettings, lstRegistryEntries)], bFormat=False)
+	return lstRegistryEntries
+
+	
+#Time every stage of an import on its own, on a registry file with iCount values, and AI project files with strProjectRows (comma separated) ROWs already in them.
+#The stages are:
+	#tokenize - TokenizeRegistryFile, reading the registry file into (value, key) pairs.
+	#parse - ParseRegistryFile, tokenizing and formatting the registry file into RegistryEntryAI objects. This is what an import spends parsing.
+	#format - FormatAIRegEntry on its own.
+	#rows - WriteRegistryRows, the ROW elements of the entries.
+	#insert - InsertRegistryEntries into each project file.
+	#reinsert - InsertRegistryEntries of the same entries again. Nothing changed, so the project file is only read.
+#Prints the results as JSON, so runs of different versions of the import script can be compared.
+def BenchmarkSuite(iCount, strProjectRows="1000,10000,100000,1000000"):
+	
+	formatSettings = ImportReg.GetRegFormatSettings("MyComponent", False, "[APPDIR]", "32")
+	dictReport = {"python": sys.version.split()[0], "values": iCount}
+	
+	with tempfile.TemporaryDirectory() as strTempDir:
+		strRegFilePath = os.path.join(strTempDir, "Benchmark.reg")
+		WriteRegistryFile(strRegFilePath, iCount)
+		iRegBytes = os.path.getsize(strRegFilePath)
+		dictReport["reg_file_mb"] = round(iRegBytes / 1e6, 2)
+		
+		def Tokenize():
+			with ImportReg.OpenRegistryFile(strRegFilePath) as regFileHandle:
+				for tupleValue in ImportReg.TokenizeRegistryFile(regFileHandle):
+					pass
+		
+		lstRegistryEntries = []
+		def Parse():
+			del lstRegistryEntries[:]
+			ImportReg.ParseRegistryFile(strRegFilePath, lstRegistryEntries, formatSettings)
+		
+		lstUnformattedEntries = []
+		def ReadUnformatted():
+			lstUnformattedEntries[:] = ReadUnformattedEntries(strRegFilePath, formatSettings)
+		def Format():
+			for CurrentRegistryEntry in lstUnformattedEntries:
+				ImportReg.FormatAIRegEntry(CurrentRegistryEntry, formatSettings)
+		
+		def Rows():
+			with open(os.devnull, "wb") as nullHandle:
+				ImportReg.WriteRegistryRows(nullHandle, lstRegistryEntries, "    ", "\n")
+		
+		dictStages = {}
+		dictStages["tokenize"] = StageResult(MeasureStage(Tokenize), iCount, iRegBytes)
+		dictStages["parse"] = StageResult(MeasureStage(Parse), len(lstRegistryEntries), iRegBytes)
+		dictStages["format"] = StageResult(MeasureStage(Format, ReadUnformatted), len(lstUnformattedEntries))
+		del lstUnformattedEntries[:]
+		dictStages["rows"] = StageResult(MeasureStage(Rows), len(lstRegistryEntries))
+		dictReport["entries"] = len(lstRegistryEntries)
+		dictReport["stages"] = dictStages
+		
+		dictReport["projects"] = []
+		for strRows in strProjectRows.split(","):
+			iRows = int(strRows)
+			strOriginalProject = os.path.join(strTempDir, "Original.aip")
+			strProjectFile = os.path.join(strTempDir, "Benchmark.aip")
+			WriteProjectFile(strOriginalProject, iRows)
+			
+			#Every run starts from the same project file.
+			def ResetProject():
+				shutil.copyfile(strOriginalProject, strProjectFile)
+			def ImportProject():
+				ResetProject()
+				ImportReg.InsertRegistryEntries(lstRegistryEntries, strProjectFile)
+			def Insert():
+				ImportReg.InsertRegistryEntries(lstRegistryEntries, strProjectFile)
+			
+			dictProject = {"rows": iRows, "project_mb": round(os.path.getsize(strOriginalProject) / 1e6, 2)}
+			dictProject["insert"] = StageResult(MeasureStage(Insert, ResetProject), len(lstRegistryEntries), os.path.getsize(strOriginalProject))
+			dictProject["reinsert"] = StageResult(MeasureStage(Insert, ImportProject), len(lstRegistryEntries), os.path.getsize(strProjectFile))
+			dictReport["projects"].append(dictProject)
+	
+	print (json.dumps(dictReport, indent=2))
+
+	
+#Compare the ROWs/sec of WriteRegistryRows with the legacy template replace, on the entries of the synthetic registry file.
+#That the ROWs parse back to their entries is checked by test_Import_Reg.py.
+def BenchmarkRows(iCount):
+	
+	with tempfile.TemporaryDirectory() as strTempDir:
+		strRegFilePath = os.path.join(strTempDir, "Benchmark.reg")
+		WriteRegistryFile(strRegFilePath, iCount)
+		lstRegistryEntries = []
+		ImportReg.ParseRegistryFile(strRegFilePath, lstRegistryEntries, ImportReg.GetRegFormatSettings("MyComponent", False, "[APPDIR]", "32"))
+	for iIndex, CurrentRegistryEntry in enumerate(lstRegistryEntries):
+		CurrentRegistryEntry.strRegistry = "MyComponent_%d" % (iIndex + 1)
+	
+	with open(os.devnull, "wb") as nullHandle:
+		fStart = time.perf_counter()
+		nullHandle.writelines(("    " + LegacyFormatRegistryObject(i) + "\n").encode("utf-8") for i in lstRegistryEntries)
+		fBefore = len(lstRegistryEntries) / (time.perf_counter() - fStart)
+		fStart = time.perf_counter()
+		ImportReg.WriteRegistryRows(nullHandle, lstRegistryEntries, "    ", "\n")
+		fAfter = len(lstRegistryEntries) / (time.perf_counter() - fStart)
+	
+	print ('WriteRegistryRows,', len(lstRegistryEntries), 'entries')
+	print ('    before: %.0f ROWs/sec (not escaped)' % fBefore)
+	print ('    after:  %.0f ROWs/sec' % fAfter)
+	print ('    speedup: %.2fx' % (fAfter / fBefore))
+
+	
+#Write the synthetic registry file (Count values) and AI project file (ProjectRows ROWs) to a directory, to try the import script on them.
+def BenchmarkCorpus(iCount, strProjectRows="1000", strDirectory="."):
+	
+	strRegFilePath = os.path.join(strDirectory, "Benchmark.reg")
+	strProjectFile = os.path.join(strDirectory, "Benchmark.aip")
+	WriteRegistryFile(strRegFilePath, iCount)
+	WriteProjectFile(strProjectFile, int(strProjectRows))
+	print ('Wrote', '\"'+strRegFilePath+'\"', 'and', '\"'+strProjectFile+'\".')
+
+	
+#Benchmarks that can be run from the command line.
+dictBenchmarks = {
+	"format": BenchmarkFormatter,
+	"memory": BenchmarkMemory,
+	"binary": BenchmarkBinary,
+	"rows": BenchmarkRows,
+	"suite": BenchmarkSuite,
+	"corpus": BenchmarkCorpus,
+}
+
+	
+if __name__ == "__main__":
+	strBenchmark = "format"
+	iCount = 1000000
+	lstArguments = sys.argv[1:]
+	if (lstArguments and not lstArguments[0].isdigit()):
+		strBenchmark = lstArguments.pop(0)
+	if lstArguments:
+		iCount = int(lstArguments[0])
+	
+	if strBenchmark not in dictBenchmarks:
+		print ('Unknown benchmark', '\"'+strBenchmark+'\".', 'Choose one of:', ', '.join(dictBenchmarks))
+		sys.exit()
+		
+	dictBenchmarks[strBenchmark](iCount, *lstArguments[1:])
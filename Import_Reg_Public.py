@@ -6,7 +6,7 @@
 #Last Updated: June 24, 2015
 #This script imports a registry file into a given component in an Advanced Installer project file.
 #Arguments: 
-	#RegistryFile.reg - The registry file you want to import. Must be in UTF-8 w/o BOM format.
+	#RegistryFile.reg - The registry file you want to import, as exported by regedit (UTF-16LE, ANSI for REGEDIT4, or UTF-8).
 	#AdvancedInstallerProjectFile.aip - The AI project file you want to import the registry file into.
 	#ComponentName - the component that you want to attach the registry entries to. This is case sensitive. The component name must exist in the project file.
 	#ComProperty - true or false - add "[COM_PROP1]" to the registry entries, so you can have duplicates (in the case of 64bit and 32bit components that have the same registry entries)	
@@ -16,286 +16,499 @@
 	#ComponentInstallDir - the installation directory MSI property that the component is being installed to. Ex: "[APPDIR]"
 #Example: Import_Reg.py MyFile.reg MyAIProject.aip MyFileComponent false 32 [APPDIR] >C:\out.txt	
 #A batch file example: %ImportRegFile% "%RegFileDir%MyProgram.reg" %AIProjectFile% MyProgram.dll %COMProperty% %Bitness% [APPDIR]
+#More targets: Import_Reg.py MyFile.reg MyAIProject.aip MyFileComponent false 32 [APPDIR] MyFileComponent64 true 64 [APPDIR]
+	#Any number of ComponentName ComProperty Platform ComponentInstallDir groups can follow the first one. The registry file is only parsed once,
+	#and the registry entries of every target are inserted with a single rewrite of the AI project file. See "ParseRegistryFileTargets".
+#Batch mode: Import_Reg.py --batch Manifest.json MyAIProject.aip [Jobs]
+	#Imports many registry files into many components with a single rewrite of the AI project file. See "ReadBatchManifest" for the manifest format (JSON or CSV).
+	#A registry file that is in the manifest more than once is only parsed once.
+	#Jobs - optional - the number of registry files parsed at the same time. Defaults to the number of CPUs.
+#Export mode: Import_Reg.py --export AdvancedInstallerProjectFile.aip Output.reg ComponentName [ComponentName ...]
+	#Writes the registry entries of the components back into a registry file, the way regedit exports it. See "ExportRegistryRows".
+	#Add --install-path [APPDIR]=C:\MyFolder to write the installation directory property as the path it stands for. It can be given more than once.
+#Library: the script can be imported as a module without side effects. See "RegistryImporter".
 #Notes:
-#Currently, the reg file must be in the following format:UTF-8 w/o BOM, which is not the default reg file encoding.
-#Other than the encoding, registry files need to be in the format as if they were "exported" from the windows registry.
+#The encoding of the reg file is detected from its BOM and its header ("Windows Registry Editor Version 5.00" or "REGEDIT4"), so regedit exports don't need to be converted first.
+#Registry files need to be in the format as if they were "exported" from the windows registry.
 #AI formats the values of a key in a specific way (character escapes, [APPDIR], etc.). It is likely that I did not address every formatting scenario.
 #The "FormatAIRegEntry" function can be modified to address further formatting issues.
 #Also, window's registry entries are formatted in a certain way. It's possible I did not address every formatting scenario, especially foreign characters.
-#This script should not be run on the same AI project file more than once, as it will just keep appending registry entries. So, either run this script on your project file once, and check in the changes. Or, run the script on your AI project file during the build process, but don't save the registry additions.
+#The script can be run on the same AI project file more than once. Registry entries that are already in the project file (same root, key, name and component) are not added again; if their value changed, the existing entry is updated.
+#Add --remove-stale to the command line to also remove the registry entries of the component that are not in the registry file anymore.
+#Add --jobs N to the command line to parse a large registry file in N processes. The result is the same as without it.
+#Add --cache Directory (and optionally --cache-size MB) to the command line to skip parsing registry files that did not change since the last run.
+#Add --stats (or --stats-json) to the command line to print how long each stage of the import took, counts of the registry entries, and the slowest values.
+#Add --diff to the command line to only compare the registry file with the registry entries of the component in the AI project file, and print the differences. Nothing is written.
+#Add --watch to the command line to keep the AI project file up to date while the registry files are edited. Only the changed registry entries are written.
 
 
 import sys
 import os
 import re
-import xml.etree.ElementTree as ET
-import fileinput
-import binascii
+import itertools
+import functools
+import contextlib
+import mmap
+import shutil
+import tempfile
 import base64
+import csv
+import json
+import concurrent.futures
+import collections
+import io
+import codecs
+import locale
+import hashlib
+import marshal
+import time
+import heapq
 
 
-#First command line argument is the registry file that we want to import into the AI project file.
-strRegFilePath = sys.argv[1]
-if(os.path.exists(strRegFilePath) == False):
-	print ('Failed to find registry file', '\"'+strRegFilePath+'\".')
-	sys.exit()
-	
-#Second command line argument is the AI project file.
-strProjectFile = sys.argv[2]
-if(os.path.exists(strProjectFile) == False):
-	print ('Failed to find AI project file', '\"'+strProjectFile+'\".')
-	sys.exit()	
-
-#Third command line argument is the component you wish to import all the registry entries into.
-strComponentName = sys.argv[3]
-if(strComponentName == ""):
-	print ('You must enter a component name')
-	sys.exit()		
-	
-#Fourth command line argument is whether you want to add [COM_PROP1] to the registry entries. Must be 'true' or 'false'.
-strComProperty = sys.argv[4]
-if strComProperty == "true":
-	strComProperty = True
-elif strComProperty == "false":
-	strComProperty = False
-else:
-	print ('ComProperty must be true or false.')
-	sys.exit()	
-
-#Fifth command line argument is whether the registry entries are being made to the 32bit or 64bit registry.
-#Even though the component's "64-bit" flag determines which hive the entries are to be made,
-#Some registry keys have values that need to be adjusted. For example \win32 vs \win64
-strPlatform = sys.argv[5]
-if(strPlatform != "64" and strPlatform != "32"):
-	print ('You must enter a platform - 32 or 64.')
-	sys.exit()		
-
-#Installation directory of the component. Use the property name of the installation folder. 
-#For most files, this will be "[APPDIR]". 
-#However, some installations might install to folders outside of APPDIR. 
-#For example, your program might install files to C:\MyFolder, which has the property name "[MYFOLDER]"
-strComponentInstallDir = sys.argv[6]
-if(strComponentInstallDir == ""):
-	print ('You must enter a the installation directory property of the component. For most components, this will be "[APPDIR]"')	
-	sys.exit()		
-else:
-	if(not strComponentInstallDir.startswith('[') or not strComponentInstallDir.endswith(']')):
-		print ('Component installation directory is not in the correct format.')	
-		print ('The installation directory should be in the format of an MSI property. For example, "[APPDIR]".')	
-		sys.exit()
-
-
-strIDPrefix = strComponentName + "_"
+#Settings of one import: which registry file goes into which component of which AI project file, and how the registry entries are formatted.
+#See the "Arguments" at the top of the file.
+class RegistryImportConfig:
+	
+	def __init__(self, strRegFilePath="", strProjectFile="", strComponentName="", strComProperty=False, strPlatform="32", strComponentInstallDir="[APPDIR]", bRemoveStale=False, iJobs=1, strCacheDir=None, iCacheSize=256 << 20):
+		self.strRegFilePath = strRegFilePath
+		self.strProjectFile = strProjectFile
+		self.strComponentName = strComponentName
+		self.strComProperty = strComProperty				#True or False.
+		self.strPlatform = strPlatform						#"32" or "64".
+		self.strComponentInstallDir = strComponentInstallDir
+		self.bRemoveStale = bRemoveStale					#Remove the ROWs of the component that are not in the registry file anymore.
+		self.iJobs = iJobs									#Number of processes that parse the registry file. None uses every CPU.
+		self.strCacheDir = strCacheDir						#Directory of the parsed registry file cache (see RegistryCache). None disables the cache.
+		self.iCacheSize = iCacheSize						#Size in bytes the cache is kept under.
 
+		
 #Class representing the registry entry in Advanced installer.
+#Large registry files create millions of these, so they use __slots__ instead of a __dict__ per entry.
 class RegistryEntryAI:
-	#I think AI uses this as the identifier (key) for the registry entry. 
-	#AI seems to use the format <prefix>_<suffix>,
-	#<prefix> is sometimes the type of registry entry (ex: AppID, ThreadingModel, etc); sometimes it is just an underscore
-	#<suffix> is an increasing integer used to prevent duplicate identifier names.
-	#For example, identifiers may look like: "AppID_1", "AppID_2", "Version_1", "Version_2", "__1", "__2", etc.
-	#For now, we are going to use the component name as the prefix, and the suffix will start at 0, increasing by 1 for each new entry.
-	strRegistry = strIDPrefix			
-	strRoot = "0"						#What root registry hive the registry entry belongs to. Ex: HKEY_CLASSES_ROOT
-	strKey = ""							#The registry key. Ex:CLSID\{12345678-1234-1234-1234-123456789ABC}\ProgID
-	strName = ""						#Name of the value being created in the key. I think if the name is blank, the value is Default.
-	strValue = ""						#The data the value contains.
-	strComponent = ""					#Name of the component you want to attach the registry entries to. Must match the component name exactly. Case-sensitive	
-
-
-def ParseRegistryFile(lstRegistryEntries):
-	
-	#Read registry file into a list. Easier to work with.
-	regFileHandle = open(strRegFilePath)
-	lstRegFile = []	
-	for line in regFileHandle:
-		lstRegFile.append(line)
-	regFileHandle.close()	
-	#To handle the very last registry entry correctly, our for loop below needs at least three \n characters.
-	#To Do: handle this in the loop instead.
-	lstRegFile.append("\n")
-	lstRegFile.append("\n")
-	lstRegFile.append("\n")
-		
-	#A registry entry block represents a key and all it's values in a registry file.
-	lstRegistryEntriesBlocks = []
-	
-	#Let's clean the registry file and create a list of registry blocks.
-	strRegistryBlock = ""
-	bFoundParentKey = False		
-	for line in lstRegFile:
-		line = line.lstrip(" ")
-		#Line is a key. 		
-		pattern1 = re.compile("\[HKEY_.*\]")
-		m1 = pattern1.match(line)
+	__slots__ = ("strRegistry", "strRoot", "strKey", "strName", "strValue", "strComponent")
+	
+	def __init__(self):
+		#I think AI uses this as the identifier (key) for the registry entry. 
+		#AI seems to use the format <prefix>_<suffix>,
+		#<prefix> is sometimes the type of registry entry (ex: AppID, ThreadingModel, etc); sometimes it is just an underscore
+		#<suffix> is an increasing integer used to prevent duplicate identifier names.
+		#For example, identifiers may look like: "AppID_1", "AppID_2", "Version_1", "Version_2", "__1", "__2", etc.
+		#For now, we are going to use the component name as the prefix. The suffix continues after the highest suffix already used in the project file.
+		#The identifier is given out when the entry is inserted into the project file (see RegistryIdAllocator).
+		self.strRegistry = ""			
+		self.strRoot = "0"						#What root registry hive the registry entry belongs to. Ex: HKEY_CLASSES_ROOT
+		self.strKey = ""						#The registry key. Ex:CLSID\{12345678-1234-1234-1234-123456789ABC}\ProgID
+		self.strName = ""						#Name of the value being created in the key. I think if the name is blank, the value is Default.
+		self.strValue = ""						#The data the value contains.
+		self.strComponent = ""					#Name of the component you want to attach the registry entries to. Must match the component name exactly. Case-sensitive	
+	
+	#Entries are sent between processes by the batch and --jobs modes. Pickling the fields as a plain tuple is a lot faster than the default for __slots__ classes.
+	def __getstate__(self):
+		return (self.strRegistry, self.strRoot, self.strKey, self.strName, self.strValue, self.strComponent)
+	
+	def __setstate__(self, tupleState):
+		self.strRegistry, self.strRoot, self.strKey, self.strName, self.strValue, self.strComponent = tupleState
+
+
+#Matches a line that is a registry key. Ex: [HKEY_CLASSES_ROOT\CLSID\{12345678-1234-1234-1234-123456789ABC}]
+patternRegKey = re.compile(r"\[HKEY_.*\]")
+
+
+#Parse the registry file and create a RegistryEntryAI object for every registry entry in it.
+#If iJobs is not 1, the file is split into chunks of whole registry blocks, which are parsed in a pool of iJobs processes (None uses every CPU).
+#The chunks are merged back in file order, and identifiers are only given out on insertion, so the result is the same as parsing in a single process.
+#If stats is a RegistryImportStats, the parsing is recorded in it.
+def ParseRegistryFile(strRegFilePath, lstRegistryEntries, formatSettings, iJobs=1, stats=None):
+	ParseRegistryFileInto(strRegFilePath, [(formatSettings, lstRegistryEntries)], iJobs, stats)
+
+	
+#Parse a registry file once, and create the RegistryEntryAI objects of several format settings from it. Ex: a 32-bit and a 64-bit component that get the same registry entries.
+#Returns a list of RegistryEntryAI objects for each format settings, the same as ParseRegistryFile would create for it (see ParseRegistryLines).
+#iJobs and stats - see ParseRegistryFile.
+def ParseRegistryFileTargets(strRegFilePath, lstFormatSettings, iJobs=1, stats=None):
+	lstTargets = [(formatSettings, []) for formatSettings in lstFormatSettings]
+	ParseRegistryFileInto(strRegFilePath, lstTargets, iJobs, stats)
+	return [lstRegistryEntries for formatSettings, lstRegistryEntries in lstTargets]
+
+	
+#Parse a registry file into lstTargets, a list of (formatSettings, lstRegistryEntries) (see ParseRegistryLines). This does the work of ParseRegistryFile and ParseRegistryFileTargets.
+def ParseRegistryFileInto(strRegFilePath, lstTargets, iJobs=1, stats=None):
+	
+	fStart = time.perf_counter()
+	with OpenRegistryFile(strRegFilePath) as regFileHandle:
+		if (iJobs == 1):
+			fFormatSeconds = stats.dictStageSeconds.get("format", 0.0) if stats else 0.0
+			ParseRegistryLines(regFileHandle, lstTargets, stats)
+			if stats:
+				stats.AddStage("read", time.perf_counter() - fStart - (stats.dictStageSeconds.get("format", 0.0) - fFormatSeconds))
+				stats.iRegBytesRead += os.path.getsize(strRegFilePath)
+			return
 		
-		#If you find a key, every line up to a newline should be part of the registry block.
-		if (m1):
-			bFoundParentKey = True
-			strRegistryBlock = strRegistryBlock + line
+		iJobs = iJobs or os.cpu_count()
+		lstFormatSettings = [formatSettings for formatSettings, lstRegistryEntries in lstTargets]
+		with concurrent.futures.ProcessPoolExecutor(max_workers=iJobs) as executor:
+			#Only a few chunks per process are read ahead, so the whole file is never in memory at once.
+			dequeFutures = collections.deque()
+			for strChunk in ReadRegistryFileChunks(regFileHandle):
+				if stats:
+					dequeFutures.append(executor.submit(ParseRegistryChunkStats, strChunk, lstFormatSettings))
+				else:
+					dequeFutures.append(executor.submit(ParseRegistryChunk, strChunk, lstFormatSettings))
+				if (len(dequeFutures) > iJobs * 2):
+					AddChunkResult(dequeFutures.popleft().result(), lstTargets, stats)
+			while dequeFutures:
+				AddChunkResult(dequeFutures.popleft().result(), lstTargets, stats)
+	
+	if stats:
+		stats.AddStage("parse", time.perf_counter() - fStart)
+		stats.iRegBytesRead += os.path.getsize(strRegFilePath)
+
+		
+#Add the result of a worker process (see ParseRegistryChunk and ParseRegistryChunkStats) to the registry entries of each format settings, and to the stats.
+def AddChunkResult(result, lstTargets, stats):
+	if stats:
+		lstChunkResults, chunkStats = result
+		stats.Merge(chunkStats)
+	else:
+		lstChunkResults = result
+	for (formatSettings, lstRegistryEntries), lstChunkEntries in zip(lstTargets, lstChunkResults):
+		lstRegistryEntries.extend(lstChunkEntries)
+
+				
+#The start of a registry file, and the encoding it means.
+#regedit exports "Windows Registry Editor Version 5.00" files as UTF-16LE with a BOM, and "REGEDIT4" files in the ANSI code page of the system.
+#The other ones are registry files that were converted, or written by other tools.
+lstRegistryFileEncodings = [
+	(codecs.BOM_UTF8, "utf-8-sig"),
+	(codecs.BOM_UTF16_LE, "utf-16"),
+	(codecs.BOM_UTF16_BE, "utf-16"),
+	("Windows Registry Editor".encode("utf-16-le"), "utf-16-le"),
+	("REGEDIT4".encode("utf-16-le"), "utf-16-le"),
+	(b"Windows Registry Editor", "utf-8"),
+	(b"REGEDIT4", locale.getencoding() if hasattr(locale, "getencoding") else locale.getpreferredencoding(False)),
+]
+
+	
+#Open a registry file as text, in the encoding it was written in (see lstRegistryFileEncodings). Files without a known start are read as UTF-8.
+#The file is decoded in large chunks while it is read, so it is never converted as a whole.
+def OpenRegistryFile(strRegFilePath):
+	
+	regFileHandle = open(strRegFilePath, "rb", buffering=1 << 20)
+	bytesStart = regFileHandle.peek(64)
+	strEncoding = "utf-8"
+	for bytesPrefix, strPrefixEncoding in lstRegistryFileEncodings:
+		if bytesStart.startswith(bytesPrefix):
+			strEncoding = strPrefixEncoding
+			break
+	
+	return io.TextIOWrapper(regFileHandle, encoding=strEncoding)
+
+	
+#Create the RegistryEntryAI objects of every registry entry in the lines of a registry file, for one or more format settings.
+#lstTargets is a list of (formatSettings, lstRegistryEntries): the entries of each format settings are added to its list.
+#The root and the key of a registry block are only read once per block, and the name and the value of a registry entry once for all the format settings.
+#Only FormatAIRegEntry, and the "[COM_PROP1]" of the key (see GetRegKey), are done for each format settings.
+#If stats is a RegistryImportStats, every entry is timed and counted in it.
+#If bFormat is False, the entries are not formatted for AI (Ex: to time FormatAIRegEntry on its own).
+def ParseRegistryLines(regLines, lstTargets, stats=None, bFormat=True):
+	
+	setComProperties = set(formatSettings.strComProperty for formatSettings, lstRegistryEntries in lstTargets)
+	strLastParentKey = None
+	for strRegValue, strParentKey in TokenizeRegistryFile(regLines):
+		fStart = time.perf_counter() if stats else 0.0
+		#Every value of a registry block has the same root and key.
+		if (strParentKey != strLastParentKey):
+			strLastParentKey = strParentKey
+			iRoot = GetRegRoot(strParentKey)
+			#Interning the key keeps a single copy of it in memory.
+			dictKeys = {strComProperty: sys.intern(GetRegKey(strParentKey, strComProperty)) for strComProperty in setComProperties}
+		strName = GetRegName(strRegValue)
+		strValue = GetRegValue(strRegValue)
+		
+		for formatSettings, lstRegistryEntries in lstTargets:
+			CurrentRegistryEntry = RegistryEntryAI()
+			CurrentRegistryEntry.strRoot = iRoot
+			CurrentRegistryEntry.strKey = dictKeys[formatSettings.strComProperty]
+			CurrentRegistryEntry.strName = strName
+			CurrentRegistryEntry.strValue = strValue
+			CurrentRegistryEntry.strComponent = formatSettings.strComponentName
+			if bFormat:
+				FormatAIRegEntry(CurrentRegistryEntry, formatSettings)
+			lstRegistryEntries.append(CurrentRegistryEntry)
+			if stats:
+				fEnd = time.perf_counter()
+				stats.AddValue(CurrentRegistryEntry, strRegValue, fEnd - fStart)
+				fStart = fEnd
+
+		
+#Parse a chunk of a registry file (see ReadRegistryFileChunks) and return its RegistryEntryAI objects, a list for each format settings. This runs in a worker process.
+def ParseRegistryChunk(strChunk, lstFormatSettings):
+	lstTargets = [(formatSettings, []) for formatSettings in lstFormatSettings]
+	ParseRegistryLines(io.StringIO(strChunk, newline="\n"), lstTargets)
+	return [lstRegistryEntries for formatSettings, lstRegistryEntries in lstTargets]
+
+	
+#Same as ParseRegistryChunk, but also returns the RegistryImportStats of the chunk.
+def ParseRegistryChunkStats(strChunk, lstFormatSettings):
+	lstTargets = [(formatSettings, []) for formatSettings in lstFormatSettings]
+	stats = RegistryImportStats()
+	ParseRegistryLines(io.StringIO(strChunk, newline="\n"), lstTargets, stats)
+	return [lstRegistryEntries for formatSettings, lstRegistryEntries in lstTargets], stats
+
+	
+#Read a registry file in chunks of about iChunkSize characters.
+#Every chunk ends right after a blank line. A blank line ends the registry block, so each chunk can be parsed on its own.
+def ReadRegistryFileChunks(regFileHandle, iChunkSize=1 << 21):
+	
+	strCarry = ""
+	while True:
+		strData = regFileHandle.read(iChunkSize)
+		if not strData:
+			if strCarry:
+				yield strCarry
+			return
+		
+		strData = strCarry + strData
+		iSplitPos = strData.rfind("\n\n") + 2
+		if (iSplitPos == 1):
+			strCarry = strData
 			continue
-		else:
-			if (line == "\n"):
-				if (strRegistryBlock != ""):				
-					lstRegistryEntriesBlocks.append(strRegistryBlock)
-				strRegistryBlock = ""
-				bFoundParentKey = False
-				continue
+		yield strData[:iSplitPos]
+		strCarry = strData[iSplitPos:]
+
 			
-			if (bFoundParentKey == True):
-				strRegistryBlock = strRegistryBlock + line			
-			continue			
-	
-	#Some registry values are represented in multiple lines. In this case, the lines end with a "\".
-	#Let's format our registry blocks so that these values are represented in a single line (remove the \n).
-	#This makes the list of registry blocks easier to handle.
-	#I'm using a separate for loop, because there may be more formatting required.
-	for i, strRegistryBlock in enumerate(lstRegistryEntriesBlocks):
-		if not strRegistryBlock:
+#Read a registry file line by line, and yield a (strRegValue, strParentKey) pair for every registry entry.
+#A key with no values is yielded as ("", strParentKey).
+#Only the line currently being read is kept in memory, so the size of the registry file doesn't matter.
+def TokenizeRegistryFile(regFileHandle):
+	
+	strParentKey = None			#The first line of the current registry block.
+	bKeyHasValues = False		#The current registry block has more lines than just the key.
+	
+	for strLine in ReadRegistryBlockLines(regFileHandle):
+		#End of the registry block.
+		if (strLine == ""):
+			#A key with no values.
+			if (strParentKey is not None and bKeyHasValues == False):
+				yield "", strParentKey
+			strParentKey = None
+			bKeyHasValues = False
 			continue
 		
-		lstRegistryEntriesBlocks[i] = strRegistryBlock.replace("\\\n","")
-	
-	#Traverse through each line of a registry block and determine if it's a key or value.
-	#Then, create a RegistryEntryAI object based on each registry entry.
-	for strRegistryBlock in lstRegistryEntriesBlocks:
-		if not strRegistryBlock:
+		#The first line of the block is the key. Any other key found inside the block is skipped.
+		if (strParentKey is None):
+			strParentKey = strLine
 			continue
+		
+		bKeyHasValues = True
+		if not patternRegKey.match(strLine):
+			yield strLine, strParentKey
+
 			
-		strRegistryBlock = strRegistryBlock.rstrip("\n")
-		lstRegistryBlockLines = strRegistryBlock.split("\n")
-									
-		for strRegistryBlockLine in lstRegistryBlockLines:
-				
-			#Line is a key
-			pattern1 = re.compile("\[HKEY_.*\]")
-			m1 = pattern1.match(strRegistryBlockLine)
-			
-			#A key with no values.
-			if (m1 and (len(lstRegistryBlockLines) == 1)):
-				GenerateAIRegEntry("", strRegistryBlockLine, lstRegistryEntries)
-				continue
-			#A key with at least one value
-			elif(m1 and (len(lstRegistryBlockLines) > 1)):
+#A registry entry block represents a key and all it's values in a registry file. Blocks are separated by a blank line.
+#Yield every line of every registry block, followed by an empty string at the end of each block.
+def ReadRegistryBlockLines(regFileHandle):
+	
+	bFoundParentKey = False		#We are inside a registry block.
+	lstLineParts = []			#Pieces of a value that is represented in multiple lines.
+	
+	#The extra "\n" ends the very last registry block.
+	for line in itertools.chain(regFileHandle, ("\n",)):
+		line = line.lstrip(" ")
+		
+		if (line == "\n"):
+			if lstLineParts:
+				strLine = "".join(lstLineParts)
+				lstLineParts = []
+				if (strLine != ""):
+					yield strLine
+			if (bFoundParentKey == True):
+				yield ""
+			bFoundParentKey = False
+			continue
+		
+		#Lines outside of a registry block (Ex: "Windows Registry Editor Version 5.00") are skipped.
+		if (bFoundParentKey == False):
+			if not patternRegKey.match(line):
 				continue
-			
-			GenerateAIRegEntry(strRegistryBlockLine, lstRegistryBlockLines[0], lstRegistryEntries)
+			bFoundParentKey = True
+		
+		#Some registry values are represented in multiple lines. In this case, the lines end with a "\".
+		#Join these lines into a single line (remove the "\" and the \n).
+		if line.endswith("\\\n"):
+			lstLineParts.append(line[:-2])
+			continue
+		
+		if line.endswith("\n"):
+			line = line[:-1]
+		if lstLineParts:
+			lstLineParts.append(line)
+			line = "".join(lstLineParts)
+			lstLineParts = []
+		
+		#The last line of the file might only contain spaces.
+		if (line != ""):
+			yield line
 	
 	
-#Create a new AI registry entry object containing the information about the registry entry read in from the file.
-def GenerateAIRegEntry(strRegValue, strParentKey, lstRegistryEntries):
+#Paths need to be replaced by the installation directory of the component. 
+#EX: "C:\\Program Files\\MyCompany\\MyProduct\\program.exe"   >   "[APPDIR]program.exe".	
+patternInstallPath = re.compile(r"\w:(\\\\[\w~ ]+)+(\\\\|([\w ]+(?=\")))")
 
-	CurrentRegistryEntry = RegistryEntryAI()	
+#AI uses some different syntax to escape certain characters. Ex: "[" is written as "[\[]".
+#Each character is only searched for once, and the value is only copied if the character is found.
+#The XML escapes (ex: "&amp;") are not done here, but when the ROW is written (see AppendRegistryRow).
+def EscapeAIRegValue(strValue):
+	
+	#A quote is escaped in the registry file. Ex: "\"Tools\""
+	if "\\\"" in strValue:
+		strValue = strValue.replace("\\\"", "\"")
+	
+	#The escapes of "[" and "]" contain each other, so they are done at the same time.
+	if "[" in strValue:
+		lstParts = strValue.split("[")
+		if "]" in strValue:
+			lstParts = [strPart.replace("]", "[\\]]") for strPart in lstParts]
+		strValue = "[\\[]".join(lstParts)
+	elif "]" in strValue:
+		strValue = strValue.replace("]", "[\\]]")
 		
-	#Set registry identifier	
-	global iIdentifierNumber
-	iIdentifierNumber = iIdentifierNumber+1	
+	if "{" in strValue:
+		strValue = strValue.replace("{", "[\\{]")
+	if "}" in strValue:
+		strValue = strValue.replace("}", "[\\}]")
 	
-	CurrentRegistryEntry.strRegistry = GetRegistry(strParentKey, strRegValue)
-	CurrentRegistryEntry.strRoot = GetRegRoot(strParentKey)
-	CurrentRegistryEntry.strKey = GetRegKey(strParentKey)
-	CurrentRegistryEntry.strName = GetRegName(strRegValue)
-	CurrentRegistryEntry.strValue = GetRegValue(strRegValue)
-	CurrentRegistryEntry.strComponent = strComponentName
+	return strValue
 
-	FormatAIRegEntry(CurrentRegistryEntry)
+
+#Settings used to format every registry entry of an import.
+#They only depend on the component, the installation directory and the platform, so they are worked out once (see GetRegFormatSettings).
+class RegFormatSettings:
 	
-	lstRegistryEntries.append(CurrentRegistryEntry)
+	def __init__(self, strComponentName, strComProperty, strComponentInstallDir, strPlatform):
+		self.strComponentName = strComponentName
+		self.strComProperty = strComProperty
+		self.strComponentInstallDir = strComponentInstallDir
+		
+		#The properties representing the installation directory (ex: [APPDIR]) are a special case and the brackets are not escaped. 
+		#Actually, any MSI property is a special case, and should not be escaped. 
+		#But, how do we detect if it's an MSI property or not. 
+		#For now, let's just handle the installation directory. Other properties can be hardcoded here.
+		strComponentInstallDirTemp = strComponentInstallDir.strip('[]')
+		self.strInstallDirEscaped = "[\\[]" + strComponentInstallDirTemp + "[\\]]"
+		self.strInstallDirProperty = "[" + strComponentInstallDirTemp + "]"
+		
+		#Keys need to reflect the correct platform:
+		if (strPlatform == "64"):
+			self.strPlatformKey = "win64"
+			self.strPlatformValueOld = "\\win32]"
+			self.strPlatformValueNew = "\\win64]"
+		else:
+			self.strPlatformKey = "win32"
+			self.strPlatformValueOld = "\\win64]"
+			self.strPlatformValueNew = "\\win32]"
 
+			
+@functools.lru_cache(maxsize=None)
+def GetRegFormatSettings(strComponentName, strComProperty, strComponentInstallDir, strPlatform):
+	return RegFormatSettings(strComponentName, strComProperty, strComponentInstallDir, strPlatform)
+
+	
 #For the registry entry objects we create, there is some special formatting for "strName" and "strValue".
-def FormatAIRegEntry(CurrentRegistryEntry):
+def FormatAIRegEntry(CurrentRegistryEntry, formatSettings):
 	
-	#Paths need to be replaced by the installation directory of the component. 
-	#EX: "C:\\Program Files\\MyCompany\\MyProduct\\program.exe"   >   "[APPDIR]program.exe".	
-	replaceRegEx = strComponentInstallDir	
-	CurrentRegistryEntry.strValue = re.sub(r"\w:(\\\\[\w~ ]+)+(\\\\|([\w ]+(?=\")))",replaceRegEx, CurrentRegistryEntry.strValue)
-		
-	if (strPlatform == "32"):
-		CurrentRegistryEntry.strKey = CurrentRegistryEntry.strKey.replace("[PLATFORM]","win32")
-	elif (strPlatform == "64"):
-		CurrentRegistryEntry.strKey = CurrentRegistryEntry.strKey.replace("[PLATFORM]","win64")	
-				
+	strValue = CurrentRegistryEntry.strValue
+	
+	CurrentRegistryEntry.strKey = CurrentRegistryEntry.strKey.replace("[PLATFORM]", formatSettings.strPlatformKey)
 	
-	#AI uses some different syntax to escape certain characters.
-	#Order of replace needs to be taken into account.
-	CurrentRegistryEntry.strValue = CurrentRegistryEntry.strValue.replace("&","&amp;")
-	CurrentRegistryEntry.strValue = CurrentRegistryEntry.strValue.replace("\\\"","&quot;")	
-	CurrentRegistryEntry.strValue = CurrentRegistryEntry.strValue.replace("[","%temp1%")
-	CurrentRegistryEntry.strValue = CurrentRegistryEntry.strValue.replace("]","%temp2%")
-	CurrentRegistryEntry.strValue = CurrentRegistryEntry.strValue.replace("%temp1%","[\\[]")
-	CurrentRegistryEntry.strValue = CurrentRegistryEntry.strValue.replace("%temp2%","[\\]]")
-	CurrentRegistryEntry.strValue = CurrentRegistryEntry.strValue.replace("{","%temp1%")
-	CurrentRegistryEntry.strValue = CurrentRegistryEntry.strValue.replace("}","%temp2%")
-	CurrentRegistryEntry.strValue = CurrentRegistryEntry.strValue.replace("%temp1%","[\\{]")
-	CurrentRegistryEntry.strValue = CurrentRegistryEntry.strValue.replace("%temp2%","[\\}]")
-	#The properties representing the installation directory (ex: [APPDIR]) are a special case and the brackets are not escaped. 
-	#Actually, any MSI property is a special case, and should not be escaped. 
-	#But, how do we detect if it's an MSI property or not. 
-	#For now, let's just handle the installation directory. Other properties can be hardcoded here.
-	strComponentInstallDirTemp = strComponentInstallDir.strip('[]')
-	CurrentRegistryEntry.strValue = CurrentRegistryEntry.strValue.replace("[\[]"+strComponentInstallDirTemp+"[\]]", "["+strComponentInstallDirTemp+"]")
-	
-	
-	#AI formats Binary entries as follows:
-	if (CurrentRegistryEntry.strValue.startswith("hex:")):
-		strTemp = CurrentRegistryEntry.strValue.replace("hex:", "")
-		strTemp = strTemp.replace(",", "")
-		CurrentRegistryEntry.strValue = "#x" + strTemp
-		
-	#AI formats DWORD entries as follows:
-	if (CurrentRegistryEntry.strValue.startswith("dword:")):
-		strTemp = CurrentRegistryEntry.strValue.replace("dword:", "")
-		i = int(strTemp, 16)
-		CurrentRegistryEntry.strValue = "#" + str(i)	
-		
-	# #AI Converts Expandable String Value to:
-	if (CurrentRegistryEntry.strValue.startswith("hex(2):")):
-		strTemp = CurrentRegistryEntry.strValue.replace("hex(2):", "")		
-		strTemp = strTemp.replace(",00", "")
-		strTemp = strTemp.replace(",", "")
-		CurrentRegistryEntry.strValue = "#%" + binascii.unhexlify(strTemp).decode('utf-8')
-		
-	# #AI Converts Multi String Value to:
-	if (CurrentRegistryEntry.strValue.startswith("hex(7):")):
-		strTemp = CurrentRegistryEntry.strValue.replace("hex(7):", "")
-		#It looks like three double zeros in a row ("00,00,00") means a new line.
-		#In AI, this is represented as "[~]"
-		strTemp = strTemp.replace(",00,00,00", "0A")
-		strTemp = strTemp.replace(",00", "")
-		strTemp = strTemp.replace(",", "")
-		
-		CurrentRegistryEntry.strValue = binascii.unhexlify(strTemp).decode('utf-8')
-		#AI represents new lines (in multi string values) as "[~]"
-		CurrentRegistryEntry.strValue = CurrentRegistryEntry.strValue.replace("\n", "[~]")
+	#Values like "dword:0000000a" or "hex:01,02" have their own format in AI. The data of these values only contains hex digits and commas, so nothing needs to be escaped.
+	iTypeEnd = strValue.find(":", 0, 7) + 1
+	FormatValueData = dictValueTypeFormatters.get(strValue[:iTypeEnd]) if iTypeEnd else None
+	if FormatValueData:
+		strValue = FormatValueData(strValue[iTypeEnd:])
+	else:
+		if ":\\\\" in strValue:
+			strValue = patternInstallPath.sub(formatSettings.strComponentInstallDir, strValue)
+		strValue = EscapeAIRegValue(strValue)
+		if "[\\[]" in strValue:
+			strValue = strValue.replace(formatSettings.strInstallDirEscaped, formatSettings.strInstallDirProperty)
 	
 	#If the name and the value are empty strings, then the entry is only a key.
 	#If there is only a root key, and no values or child keys, it looks like AI sets the "Name" to a "+"
 	#To Do: It's possible for a root key to be listed in the registry file with not values,
 	#but the subsequent lines are child keys. So, we should not set the "Name" of the root key to "+".
 	#For now, let's skip the child key check, as it shouldn't harm anything.
-	if (CurrentRegistryEntry.strValue == "" and CurrentRegistryEntry.strName == ""):
+	if (strValue == "" and CurrentRegistryEntry.strName == ""):
 		CurrentRegistryEntry.strName = "+"
 			
 	#Keys need to reflect the correct platform:
-	if (strPlatform == "32"):
-		CurrentRegistryEntry.strValue = CurrentRegistryEntry.strValue.replace("\win64]","\win32]")
-	elif (strPlatform == "64"):
-		CurrentRegistryEntry.strValue = CurrentRegistryEntry.strValue.replace("\win32]","\win64]")
+	CurrentRegistryEntry.strValue = strValue.replace(formatSettings.strPlatformValueOld, formatSettings.strPlatformValueNew)
 		
+
+#Decode the comma separated hex of a registry value (Ex: "01,02,ff") into bytes.
+#bytes.fromhex() skips whitespace between the bytes, and replacing "," with a character of the same length is cheaper than removing it.
+def DecodeRegistryHex(strData):
+	return bytes.fromhex(strData.replace(",", " "))
+
+	
+#Decode the data of a REG_EXPAND_SZ or REG_MULTI_SZ value. The strings are UTF-16LE, and each one ends with a null character.
+def DecodeRegistryString(strData):
+	return DecodeRegistryHex(strData).decode("utf-16-le", "replace")
+
+	
+#AI formats Binary entries as follows:
+#The hex digits are kept as they are in the registry file (Ex: "hex:0A,ff" -> "#x0Aff"), so the project file doesn't change when the case of the digits is different.
+def FormatBinaryValue(strData):
+	return "#x" + strData.replace(",", "")
+
 	
-def GetRegistry(strParentKey, strRegValue):	
+#AI formats DWORD entries as follows:
+def FormatDwordValue(strData):
+	return "#" + str(int(strData, 16))
+
 	
-	global iIdentifierNumber
-	strRegistry = strIDPrefix + str(iIdentifierNumber)		
+#AI Converts Expandable String Value to:
+def FormatExpandStringValue(strData):
+	return "#%" + DecodeRegistryString(strData).rstrip("\0")
+
 	
-	return strRegistry
+#AI Converts Multi String Value to:
+def FormatMultiStringValue(strData):
+	#The strings are separated by a null character, and the list ends with an extra one.
+	#In AI, every string is followed by "[~]"
+	return DecodeRegistryString(strData).removesuffix("\0").replace("\0", "[~]")
+
+
+#The type prefix of a registry value, and the function that formats the data after it.
+dictValueTypeFormatters = {
+	"hex:": FormatBinaryValue,
+	"dword:": FormatDwordValue,
+	"hex(2):": FormatExpandStringValue,
+	"hex(7):": FormatMultiStringValue,
+}
+
 	
+#The patterns below are compiled once, not for every line of the registry file.
+#The root hive of a key. Ex: HKEY_CLASSES_ROOT in [HKEY_CLASSES_ROOT\CLSID]
+patternRegRoot = re.compile(r'HKEY_\w+_\w+')
+#The start of a key, up to the end of its root hive. Ex: [HKEY_CLASSES_ROOT\ in [HKEY_CLASSES_ROOT\CLSID]
+patternRegKeyRoot = re.compile(r"\[HKEY_\w+_\w+\\")
+#A Default value. Ex: @="My Component"
+patternRegDefaultValue = re.compile("@=\".*\"")
+#A non-default value. Ex: "AppID"="{00000000-0000-0000-0000-000000000000}"
+patternRegNamedValue = re.compile("\".*\"=.*")
+#The name of a non-default value, with its quotes.
+patternRegName = re.compile("\".*?\"")
+#The data of a Default value, with its quotes.
+patternRegDefaultData = re.compile("\".*\"")
+#The data of a non-default value, after the "=".
+patternRegNamedData = re.compile("=.*")
+
 	
 #Determine what registry hive the key belongs to, and assign the value that matches AI.
 def GetRegRoot(strKey):	
 
-	pattern = re.compile('HKEY_\w+_\w+')
-	m = pattern.search(strKey)
+	m = patternRegRoot.search(strKey)
 	if m:
 		if (m.group(0) == "HKEY_CLASSES_ROOT"):
 			return 0
@@ -313,12 +526,11 @@ def GetRegRoot(strKey):
 	
 #Extract the key (everything that is not the root). 
 #Ex:CLSID\{12345678-1234-1234-1234-123456789ABC}\ProgID in HKEY_CLASSES_ROOT\CLSID\{12345678-1234-1234-1234-123456789ABC}\ProgID
-def GetRegKey(strKey):
+def GetRegKey(strKey, strComProperty):
 
-	pattern = re.compile("\[HKEY_\w+_\w+\\\\")
-	m = pattern.match(strKey)
+	m = patternRegKeyRoot.match(strKey)
 	if m:
-		strKeyTemp = re.sub(pattern, "", strKey, 0, 0)
+		strKeyTemp = patternRegKeyRoot.sub("", strKey)
 		strKeyTemp = strKeyTemp[:-1]
 	
 		if strComProperty == True:
@@ -339,19 +551,15 @@ def GetRegName(strRegValue):
 	strNameTemp = ""
 	
 	#The current line is the Default value. 
-	pattern = re.compile("@=\".*\"")
-	m = pattern.match(strRegValue)
+	m = patternRegDefaultValue.match(strRegValue)
 	if m:
 		return ""
 	
 	#The current line is a non-default value 
-	#pattern = re.compile("\".*\"=\".*\"")
-	pattern = re.compile("\".*\"=.*")
-	m = pattern.match(strRegValue)	
+	m = patternRegNamedValue.match(strRegValue)	
 	if m:
 		#extract the name of the registry value
-		pattern2 = re.compile("\".*?\"")
-		m2 = pattern2.findall(strRegValue)
+		m2 = patternRegName.findall(strRegValue)
 		if m2:
 			strNameTemp = m2[0].strip('"')	
 	
@@ -364,26 +572,18 @@ def GetRegValue(strRegValue):
 	strValueTemp = ""
 	
 	#The current line is the Default value. 
-	pattern = re.compile("@=\".*\"")
-	m = pattern.match(strRegValue)
+	m = patternRegDefaultValue.match(strRegValue)
 	if m:
 		#extract the data for the value
-		pattern2 = re.compile("\".*\"")
-		m2 = pattern2.search(strRegValue)		
+		m2 = patternRegDefaultData.search(strRegValue)		
 		if m2:
 			strValueTemp = m2.group(0)[1:-1]
 	
 	#The current line is a non-default value 
-	#pattern = re.compile("\".*\"=\".*\"")
-	pattern = re.compile("\".*\"=.*")
-	#pattern = re.compile("\".*\"=([^\n\r]+)(\s+.*\r\n)*", re.MULTILINE)
-	m = pattern.match(strRegValue)	
+	m = patternRegNamedValue.match(strRegValue)	
 	if m:
 		#extract the value of the registry value
-		#pattern2 = re.compile("\".*?\"")
-		pattern2 = re.compile("=.*")
-		#pattern2 = re.compile("=.*", re.MULTILINE)
-		m2 = pattern2.findall(strRegValue)
+		m2 = patternRegNamedData.findall(strRegValue)
 		if m2:			
 			strValueTemp = m2[0].lstrip('=')
 			strValueTemp = strValueTemp.strip('"')
@@ -392,75 +592,1394 @@ def GetRegValue(strRegValue):
 	
 	
 #Take the registry information we extracted and format it according to the AI XML.
-#To do: use XML api for insertion
-def FormatRegistryObjects(lstRegistryEntries, lstRegistryXMLEntries):
+#This is a generator: each ROW is only formatted when it's asked for, so the XML of all the entries is never in memory at once.
+#The identifiers of the entries are given out on insertion. To see them before that, call AssignRegistryIds first (see RegistryImporter.Format).
+def FormatRegistryObjects(lstRegistryEntries):
+
+	for i in lstRegistryEntries:
+		yield FormatRegistryObject(i)
+		
+		
+#Format a single registry entry according to the AI XML.
+def FormatRegistryObject(i):
+
+	lstBuffer = []
+	AppendRegistryRow(lstBuffer, i)
+	return "".join(lstBuffer)
+	
+	
+#Append the ROW of a registry entry to lstBuffer, one piece at a time. Every attribute is escaped as it's appended (see EscapeXmlAttribute).
+#Ex: <ROW Registry="MyComponent_1" Root="0" Key="CLSID\{12345678-1234-1234-1234-123456789ABC}" Name="AppID" Value="..." Component_="MyComponent"/>
+def AppendRegistryRow(lstBuffer, i):
+
+	lstBuffer += ('<ROW Registry="', EscapeXmlAttribute(i.strRegistry), '" Root="', str(i.strRoot), '" Key="', EscapeXmlAttribute(i.strKey))
+	#Handle the "Name" (there will not always be a "Name" entry)
+	if (i.strName != ""):
+		lstBuffer += ('" Name="', EscapeXmlAttribute(i.strName))
+	#Handle the "Value" (there will not always be a "Value" entry)
+	if (i.strName != "+"):
+		lstBuffer += ('" Value="', EscapeXmlAttribute(i.strValue))
+	lstBuffer += ('" Component_="', EscapeXmlAttribute(i.strComponent), '"/>')
 
-	#This string is the format of the AI XML for a registry entry.		
-	strRegistryXMLEntry = "<ROW Registry=[%1] Root=[%2] Key=[%3][%4][%5] Component_=[%6]/>"
 	
+#Write the ROWs of the registry entries to a binary file, each one on its own line, starting with strIndent and ending with strNewLine.
+#The ROWs are appended to a single buffer, which is written out every iBufferParts pieces, so there is no list of all the ROWs.
+def WriteRegistryRows(fileHandle, lstRegistryEntries, strIndent, strNewLine, iBufferParts=1 << 16):
+
+	lstBuffer = []
 	for i in lstRegistryEntries:
-		strRegistryXMLEntryTemp = strRegistryXMLEntry;
-		strRegistryXMLEntryTemp = strRegistryXMLEntryTemp.replace("[%1]", "\""+i.strRegistry+"\"")
-		strRegistryXMLEntryTemp = strRegistryXMLEntryTemp.replace("[%2]", "\""+str(i.strRoot)+"\"")
-		strRegistryXMLEntryTemp = strRegistryXMLEntryTemp.replace("[%3]", "\""+i.strKey+"\"")
-		#Handle the "Name" (there will not always be a "Name" entry)
-		if(i.strName != "" ):
-			strRegistryXMLEntryTemp = strRegistryXMLEntryTemp.replace("[%4]"," Name="+"\""+i.strName+"\"")
+		lstBuffer.append(strIndent)
+		AppendRegistryRow(lstBuffer, i)
+		lstBuffer.append(strNewLine)
+		if (len(lstBuffer) >= iBufferParts):
+			fileHandle.write("".join(lstBuffer).encode("utf-8"))
+			lstBuffer.clear()
+	fileHandle.write("".join(lstBuffer).encode("utf-8"))
+	
+
+#Characters that can't be written as they are in an XML attribute, and what is written instead.
+#Line breaks and tabs are written as character references, so the XML parser keeps them, and every ROW stays on a single line of the project file.
+#">" is valid in an attribute, and is written as it is, like it always was.
+dictXmlEscapes = str.maketrans({"&": "&amp;", "<": "&lt;", "\"": "&quot;", "\n": "&#10;", "\r": "&#13;", "\t": "&#9;"})
+#Characters that can be escaped in a ROW of the project file: the ones above, and ">", which AI may write as "&gt;".
+patternXmlEscape = re.compile('[&<>"\n\r\t]')
+
+#Escape a string for an XML attribute, in a single pass. Most strings have nothing to escape, and are returned as they are.
+#Searching for each character with "in" is several times faster than a regular expression on strings this short.
+def EscapeXmlAttribute(strValue):
+	if ("&" in strValue or "\"" in strValue or "<" in strValue or "\n" in strValue or "\r" in strValue or "\t" in strValue):
+		return strValue.translate(dictXmlEscapes)
+	return strValue
+
+	
+#References in an XML attribute. Ex: "&amp;", "&#10;", "&#xA;"
+patternXmlReference = re.compile(r"&(?:#([0-9]+)|#x([0-9a-fA-F]+)|(amp|lt|gt|quot|apos));")
+dictXmlEntities = {"amp": "&", "lt": "<", "gt": ">", "quot": "\"", "apos": "'"}
+
+#Turn an attribute of the project file (as bytes) back into the string it stands for. This is the reverse of EscapeXmlAttribute.
+def UnescapeXmlAttribute(bytesValue):
+	strValue = bytesValue.decode("utf-8")
+	if "&" in strValue:
+		strValue = patternXmlReference.sub(ReplaceXmlReference, strValue)
+	return strValue
+
+def ReplaceXmlReference(m):
+	if m.group(1):
+		return chr(int(m.group(1)))
+	if m.group(2):
+		return chr(int(m.group(2), 16))
+	return dictXmlEntities[m.group(3)]
+		
+	
+#Key used to match a registry entry with a ROW that already exists in the MsiRegsComponent table: (Root, Key, Name, Component_), before they are escaped for XML.
+#The strings are the ones the entry already holds, so the key itself is the only new object.
+def GetRegistryRowKey(CurrentRegistryEntry):
+	return (str(CurrentRegistryEntry.strRoot), CurrentRegistryEntry.strKey, CurrentRegistryEntry.strName, CurrentRegistryEntry.strComponent)
+
+
+#Whether two values in the format of AI are the same value.
+#The hex digits of Binary values ("#x...") are compared without their case: the import keeps them as they are in the registry file (see FormatBinaryValue), and an export writes them in lowercase (see FormatRegHex).
+def IsSameRegistryValue(strValue, strOtherValue):
+	return strValue == strOtherValue or (strValue.startswith("#x") and strOtherValue.startswith("#x") and strValue.lower() == strOtherValue.lower())
+
+	
+#Matches an attribute of a ROW in the project file. Ex: Key="CLSID\{12345678-1234-1234-1234-123456789ABC}"
+patternXmlAttribute = re.compile(rb'([\w.:-]+)="([^"]*)"')
+
+	
+#Gives out registry identifiers (see the "RegistryEntryAI" class comments) that don't collide with the ones already in the project file.
+#For every prefix, it keeps the highest suffix in use, and continues after it.
+#The suffixes are only kept between imports while the project file is the one the last import wrote. Otherwise, they are read again from the project file (see Reset),
+#so importing into the same project file always gives the same identifiers, no matter what was imported before in the process.
+class RegistryIdAllocator:
+	
+	def __init__(self):
+		self.dictHighWater = {}				#Prefix (as bytes) -> highest suffix in use. Only the prefixes we give out identifiers for are kept.
+		self.tupleProjectStat = None		#(inode, modification time, size) of the project file when every ROW of it was last observed.
+	
+	#Start keeping track of a prefix. Ex: "MyComponent_"
+	#Returns True if the prefix is new, so the ROWs of the project file have not been observed for it yet.
+	def AddPrefix(self, strPrefix):
+		bytesPrefix = EscapeXmlAttribute(strPrefix).encode("utf-8")
+		if bytesPrefix in self.dictHighWater:
+			return False
+		self.dictHighWater[bytesPrefix] = 0
+		return True
+	
+	#Take note of an identifier that is in use, as it's written in the project file. Ex: b"MyComponent_12"
+	def Observe(self, strRegistry):
+		iSeparator = strRegistry.rfind(b"_") + 1
+		if iSeparator:
+			strPrefix = strRegistry[:iSeparator]
+			iHighWater = self.dictHighWater.get(strPrefix)
+			if (iHighWater is not None and strRegistry[iSeparator:].isdigit() and int(strRegistry[iSeparator:]) > iHighWater):
+				self.dictHighWater[strPrefix] = int(strRegistry[iSeparator:])
+	
+	#Forget the suffixes in use, before every ROW of the project file is observed again. The prefixes are kept.
+	def Reset(self):
+		for bytesPrefix in self.dictHighWater:
+			self.dictHighWater[bytesPrefix] = 0
+		self.tupleProjectStat = None
+	
+	#Give out the next identifier for the prefix.
+	def Allocate(self, strPrefix):
+		bytesPrefix = EscapeXmlAttribute(strPrefix).encode("utf-8")
+		iNumber = self.dictHighWater.get(bytesPrefix, 0) + 1
+		self.dictHighWater[bytesPrefix] = iNumber
+		return strPrefix + str(iNumber)
+
+		
+#One RegistryIdAllocator per project file, so imports into the same project file in one process never hand out the same identifier.
+dictRegistryIdAllocators = {}
+
+def GetRegistryIdAllocator(strProjectFile):
+	return dictRegistryIdAllocators.setdefault(os.path.abspath(strProjectFile), RegistryIdAllocator())
+
+	
+#Yield the (start, end) of every line of the MsiRegsComponent table.
+def ReadTableLines(projectView, iTableStart, iTableEnd):
+	
+	iLineStart = iTableStart
+	while iLineStart < iTableEnd:
+		iLineEnd = projectView.find(b"\n", iLineStart, iTableEnd) + 1
+		if (iLineEnd == 0):
+			iLineEnd = iTableEnd
+		yield iLineStart, iLineEnd
+		iLineStart = iLineEnd
+
+		
+#Return the (start, end) of the lines of the MsiRegsComponent table that contain one of the keys, in file order.
+#Each key is a plain search of the project file, so this is much faster than reading every line when there are only a few keys.
+def FindTableLines(projectView, iTableStart, iTableEnd, setKeys):
+	
+	setLineStarts = set()
+	for strKey in setKeys:
+		bytesSearch = b'Key="' + EscapeXmlAttribute(strKey).encode("utf-8") + b'"'
+		iPos = projectView.find(bytesSearch, iTableStart, iTableEnd)
+		while (iPos != -1):
+			setLineStarts.add(max(projectView.rfind(b"\n", iTableStart, iPos) + 1, iTableStart))
+			iPos = projectView.find(bytesSearch, iPos + 1, iTableEnd)
+	
+	lstLines = []
+	for iLineStart in sorted(setLineStarts):
+		iLineEnd = projectView.find(b"\n", iLineStart, iTableEnd) + 1
+		lstLines.append((iLineStart, iLineEnd or iTableEnd))
+	return lstLines
+
+	
+#Compare the ROW elements that already exist in the MsiRegsComponent table with the registry entries being imported.
+#lstTableLines are the (start, end) of the lines to look at, see ReadTableLines and FindTableLines.
+#Returns a list of (iStart, iEnd, strRow) edits: the bytes from iStart to iEnd of the project file are replaced by strRow (None removes the line).
+#Entries that were matched with an existing ROW are removed from dictNewEntries, so only the entries that need a new ROW are left in it.
+#ROWs are matched by (Root, Key, Name, Component_), so looking up each row is a single dictionary lookup, no matter how big the table is.
+#The identifier of every ROW is passed to the registryIdAllocator in the same scan.
+#ROWs whose (Root, Key, Name, Component_) is in setRemovedKeys are removed, even if bRemoveStale is False.
+def IndexRegistryTable(projectView, lstTableLines, dictNewEntries, bRemoveStale, registryIdAllocator, setRemovedKeys=frozenset()):
+	
+	setComponents = set(EscapeXmlAttribute(CurrentRegistryEntry.strComponent).encode("utf-8") for CurrentRegistryEntry in dictNewEntries.values())
+	setComponents.update(EscapeXmlAttribute(tupleRowKey[3]).encode("utf-8") for tupleRowKey in setRemovedKeys)
+	lstEdits = []
+	
+	for iRowStart, iLineEnd in lstTableLines:
+		strLine = projectView[iRowStart:iLineEnd]
+		if b"<ROW " not in strLine:
+			continue
+		dictAttributes = dict(patternXmlAttribute.findall(strLine))
+		registryIdAllocator.Observe(dictAttributes.get(b"Registry", b""))
+		strComponent = dictAttributes.get(b"Component_", b"")
+		if strComponent not in setComponents:
+			continue
+		
+		tupleRowKey = (UnescapeXmlAttribute(dictAttributes.get(b"Root", b"")), UnescapeXmlAttribute(dictAttributes.get(b"Key", b"")), UnescapeXmlAttribute(dictAttributes.get(b"Name", b"")), UnescapeXmlAttribute(strComponent))
+		CurrentRegistryEntry = dictNewEntries.pop(tupleRowKey, None)
+		if CurrentRegistryEntry is None:
+			#The ROW is not in the registry file anymore (or it's a duplicate of a ROW we already matched).
+			if bRemoveStale or tupleRowKey in setRemovedKeys:
+				lstEdits.append((iRowStart, iLineEnd, None))
+			continue
+		
+		#Keep the identifier of the existing ROW, and only rewrite it if the value changed.
+		CurrentRegistryEntry.strRegistry = UnescapeXmlAttribute(dictAttributes.get(b"Registry", b""))
+		if not IsSameRegistryValue(UnescapeXmlAttribute(dictAttributes.get(b"Value", b"")), CurrentRegistryEntry.strValue):
+			lstEdits.append((iRowStart, iLineEnd, FormatRegistryObject(CurrentRegistryEntry)))
+			
+	return lstEdits
+
+	
+#Give registry entries the identifiers they would get if they were inserted into the AI project file now (see InsertRegistryEntries), without writing anything.
+#Entries that match a ROW of the project file get its identifier, the others get the next free ones. Entries with the same (Root, Key, Name, Component_) get the same identifier.
+#The project file is scanned with an allocator of its own, so the identifiers given out by imports in this process don't change.
+def AssignRegistryIds(lstRegistryEntries, strProjectFile):
+	
+	dictNewEntries = {}
+	for CurrentRegistryEntry in lstRegistryEntries:
+		dictNewEntries.setdefault(GetRegistryRowKey(CurrentRegistryEntry), CurrentRegistryEntry)
+	dictRowEntries = dict(dictNewEntries)
+	
+	registryIdAllocator = RegistryIdAllocator()
+	for CurrentRegistryEntry in dictNewEntries.values():
+		registryIdAllocator.AddPrefix(CurrentRegistryEntry.strComponent + "_")
+	
+	with MapRegistryTable(strProjectFile, False) as tupleProject:
+		if tupleProject is not None:
+			projectMap, iTableStart, iTableEnd, statProject = tupleProject
+			IndexRegistryTable(projectMap, ReadTableLines(projectMap, iTableStart, iTableEnd), dictNewEntries, False, registryIdAllocator)
+	
+	for CurrentRegistryEntry in dictNewEntries.values():
+		CurrentRegistryEntry.strRegistry = registryIdAllocator.Allocate(CurrentRegistryEntry.strComponent + "_")
+	for CurrentRegistryEntry in lstRegistryEntries:
+		CurrentRegistryEntry.strRegistry = dictRowEntries[GetRegistryRowKey(CurrentRegistryEntry)].strRegistry
+
+		
+#Find the MsiRegsComponent XML element in the AI project file.
+#Returns (iTableStart, iTableEnd): the start of the line that opens the element, and the start of the line that closes it. The new registry entries go at iTableEnd.
+#Returns None if the project file has no MsiRegsComponent element.
+def FindRegistryTable(projectView):
+	
+	#We've found the XML element containing the registry entries.
+	iTablePos = projectView.find(b"MsiRegsComponent")
+	if (iTablePos == -1):
+		return None
+	iTableStart = projectView.rfind(b"\n", 0, iTablePos) + 1
+	
+	#We want to append our registry entries to the end of the MsiRegsComponent XML element.
+	iClosePos = projectView.find(b"</COMPONENT>", iTableStart)
+	if (iClosePos == -1):
+		return None
+	
+	return iTableStart, projectView.rfind(b"\n", 0, iClosePos) + 1
+
+	
+#Map an AI project file read-only, and find its MsiRegsComponent element (see FindRegistryTable).
+#Yields (projectMap, iTableStart, iTableEnd, statProject), or None if the project file has no MsiRegsComponent element.
+#If bReportMissing is True, a missing element is printed as well.
+#Ex:
+	#with MapRegistryTable("MyAIProject.aip") as tupleProject:
+@contextlib.contextmanager
+def MapRegistryTable(strProjectFile, bReportMissing=True):
+	
+	with open(strProjectFile, "rb") as projectHandle:
+		statProject = os.fstat(projectHandle.fileno())
+		#An empty file can't be mapped.
+		if (statProject.st_size != 0):
+			with mmap.mmap(projectHandle.fileno(), 0, access=mmap.ACCESS_READ) as projectMap:
+				tupleTable = FindRegistryTable(projectMap)
+				if tupleTable is not None:
+					yield projectMap, tupleTable[0], tupleTable[1], statProject
+					return
+		
+		if bReportMissing:
+			print ('Failed to find the MsiRegsComponent element in AI project file', '\"'+strProjectFile+'\".')
+		yield None
+
+	
+#Up to this many different keys, the ROWs to update are found by searching the project file for each key instead of reading every ROW.
+iMaxSearchedKeys = 32
+
+	
+#Insert registry entries into AI project file.
+#Registry entries that already have a ROW in the MsiRegsComponent table are not added again: the ROW is only rewritten if the value changed.
+#If bRemoveStale is True, ROWs of the imported components that are not in the registry entries anymore are removed.
+#ROWs whose (Root, Key, Name, Component_) is in setRemovedKeys are removed as well (see GetRegistryRowKey).
+#The project file is scanned once, then written once, to a temporary file that replaces the project file when it's complete. 
+#So a failure never leaves a truncated project behind.
+#To do: use XML api for insertion
+#If stats is a RegistryImportStats, the time and the bytes of the index and write stages are recorded in it.
+#Returns True if the project file has every registry entry (whether it was written or not), False if it has no MsiRegsComponent table.
+def InsertRegistryEntries(lstRegistryEntries, strProjectFile, bRemoveStale=False, setRemovedKeys=frozenset(), stats=None):
+	
+	fStart = time.perf_counter()
+
+	#Entries with the same (Root, Key, Name, Component_) would end up as duplicate ROWs. The last value wins, just like regedit.
+	dictNewEntries = {}
+	for CurrentRegistryEntry in lstRegistryEntries:
+		tupleRowKey = GetRegistryRowKey(CurrentRegistryEntry)
+		if tupleRowKey in dictNewEntries:
+			dictNewEntries[tupleRowKey].strValue = CurrentRegistryEntry.strValue
 		else:
-			strRegistryXMLEntryTemp = strRegistryXMLEntryTemp.replace("[%4]","")
-		#Handle the "Value" (there will not always be a "Value" entry)
-		if(i.strName != "+"):
-			strRegistryXMLEntryTemp = strRegistryXMLEntryTemp.replace("[%5]"," Value="+"\""+i.strValue+"\"")
+			dictNewEntries[tupleRowKey] = CurrentRegistryEntry
+
+	with MapRegistryTable(strProjectFile) as tupleProject:
+		if tupleProject is None:
+			return False
+		projectMap, iTableStart, iInsertPos, statProject = tupleProject
+		
+		registryIdAllocator = GetRegistryIdAllocator(strProjectFile)
+		bNewPrefix = False
+		for CurrentRegistryEntry in dictNewEntries.values():
+			if registryIdAllocator.AddPrefix(CurrentRegistryEntry.strComponent + "_"):
+				bNewPrefix = True
+		
+		#If every ROW was already observed by the allocator, and nothing else changed the project file since, only the ROWs with the keys of the entries need to be read.
+		#This is what keeps repeated imports of a few entries into the same project file fast (see RegistryWatcher).
+		tupleProjectStat = (statProject.st_ino, statProject.st_mtime_ns, statProject.st_size)
+		setKeys = set(tupleRowKey[1] for tupleRowKey in itertools.chain(dictNewEntries, setRemovedKeys))
+		#A key with characters that are escaped in XML is always looked for in every ROW, as it could be escaped in more than one way.
+		if (not bRemoveStale and not bNewPrefix and registryIdAllocator.tupleProjectStat == tupleProjectStat and len(setKeys) <= iMaxSearchedKeys and not any(patternXmlEscape.search(strKey) for strKey in setKeys)):
+			lstTableLines = FindTableLines(projectMap, iTableStart, iInsertPos, setKeys)
+		else:
+			registryIdAllocator.Reset()
+			lstTableLines = ReadTableLines(projectMap, iTableStart, iInsertPos)
+		lstEdits = IndexRegistryTable(projectMap, lstTableLines, dictNewEntries, bRemoveStale, registryIdAllocator, setRemovedKeys)
+		registryIdAllocator.tupleProjectStat = tupleProjectStat
+		fIndexEnd = time.perf_counter()
+		if stats:
+			stats.AddStage("index", fIndexEnd - fStart)
+			stats.iProjectBytesRead += statProject.st_size
+		#The project file already contains every registry entry.
+		if (not lstEdits and not dictNewEntries):
+			return True
+		
+		for CurrentRegistryEntry in dictNewEntries.values():
+			CurrentRegistryEntry.strRegistry = registryIdAllocator.Allocate(CurrentRegistryEntry.strComponent + "_")
+		
+		#Keep the line endings of the project file.
+		strNewLine = "\r\n" if projectMap[max(iInsertPos - 2, 0):iInsertPos] == b"\r\n" else "\n"
+		
+		iTempHandle, strTempPath = tempfile.mkstemp(prefix=os.path.basename(strProjectFile) + ".", suffix=".tmp", dir=os.path.dirname(os.path.abspath(strProjectFile)))
+		try:
+			with os.fdopen(iTempHandle, "wb", buffering=1 << 20) as tempHandle, memoryview(projectMap) as projectView:
+				iPos = 0
+				for iStart, iEnd, strRow in lstEdits:
+					tempHandle.write(projectView[iPos:iStart])
+					if strRow is not None:
+						tempHandle.write(("    " + strRow + strNewLine).encode("utf-8"))
+					iPos = iEnd
+				tempHandle.write(projectView[iPos:iInsertPos])
+				WriteRegistryRows(tempHandle, dictNewEntries.values(), "    ", strNewLine)
+				tempHandle.write(projectView[iInsertPos:])
+				tempHandle.flush()
+				os.fsync(tempHandle.fileno())
+				statProject = os.fstat(tempHandle.fileno())
+			shutil.copymode(strProjectFile, strTempPath)
+		except:
+			os.remove(strTempPath)
+			#The identifiers given out were not written. Scan the project file again on the next import.
+			registryIdAllocator.tupleProjectStat = None
+			raise
+	
+	try:
+		os.replace(strTempPath, strProjectFile)
+	except:
+		os.remove(strTempPath)
+		registryIdAllocator.tupleProjectStat = None
+		raise
+	registryIdAllocator.tupleProjectStat = (statProject.st_ino, statProject.st_mtime_ns, statProject.st_size)
+	if stats:
+		stats.AddStage("write", time.perf_counter() - fIndexEnd)
+		stats.iBytesWritten += statProject.st_size
+	return True
+
+	
+#Names of the root hives, by the value GetRegRoot gives them.
+dictRootNames = {0: "HKEY_CLASSES_ROOT", 1: "HKEY_CURRENT_USER", 2: "HKEY_LOCAL_MACHINE", 3: "HKEY_USERS", 5: "HKEY_CURRENT_CONFIG"}
+
+
+#Statistics of an import: wall time per stage, entries by value type and root hive, bytes read and written, and the values that took the longest to format.
+#Pass one to RegistryImporter (or to ParseRegistryFile and InsertRegistryEntries) to fill it in, then print Report() or save ToDict() as JSON.
+#This is also the hook for build tools: override AddStage() to get every stage as it ends (except format, which is added up value by value).
+#The stages are:
+	#read - reading the registry file and splitting it into registry entries.
+	#format - formatting the registry entries for AI.
+	#parse - read and format together. Only when the registry file is parsed in several processes (--jobs), where the two can't be told apart.
+	#cache - looking the registry file up in the cache, when it was found.
+	#index - reading the project file and matching its ROWs with the registry entries.
+	#write - writing the project file.
+class RegistryImportStats:
+	
+	def __init__(self, iSlowestValues=10):
+		self.fStart = time.perf_counter()
+		self.dictStageSeconds = {}				#Stage -> seconds. Stages that run more than once (ex: in batch mode) are added up.
+		self.counterValueTypes = collections.Counter()
+		self.counterRoots = collections.Counter()
+		self.iEntries = 0
+		self.iRegBytesRead = 0					#Bytes of the registry files.
+		self.iProjectBytesRead = 0				#Bytes of the project file.
+		self.iBytesWritten = 0
+		self.iSlowestValues = iSlowestValues
+		self.lstSlowestValues = []				#Heap of (seconds, value type, root, key, name, length of the value).
+	
+	#Take note of the wall time of a stage.
+	def AddStage(self, strStage, fSeconds):
+		self.dictStageSeconds[strStage] = self.dictStageSeconds.get(strStage, 0.0) + fSeconds
+	
+	#Take note of a registry entry: strRegValue is its line in the registry file, and fSeconds the time it took to create and format it.
+	def AddValue(self, CurrentRegistryEntry, strRegValue, fSeconds):
+		if (strRegValue == ""):
+			strType = "key"
 		else:
-			strRegistryXMLEntryTemp = strRegistryXMLEntryTemp.replace("[%5]","")
-		strRegistryXMLEntryTemp = strRegistryXMLEntryTemp.replace("[%6]", "\""+i.strComponent+"\"")	
+			strValue = GetRegValue(strRegValue)
+			iTypeEnd = strValue.find(":", 0, 7) + 1
+			strType = strValue[:iTypeEnd - 1] if strValue[:iTypeEnd] in dictValueTypeFormatters else "string"
+		self.counterValueTypes[strType] += 1
+		self.counterRoots[dictRootNames.get(int(CurrentRegistryEntry.strRoot), str(CurrentRegistryEntry.strRoot))] += 1
+		self.iEntries += 1
+		self.dictStageSeconds["format"] = self.dictStageSeconds.get("format", 0.0) + fSeconds
+		
+		tupleValue = (fSeconds, strType, CurrentRegistryEntry.strRoot, CurrentRegistryEntry.strKey, CurrentRegistryEntry.strName, len(strRegValue))
+		if (len(self.lstSlowestValues) < self.iSlowestValues):
+			heapq.heappush(self.lstSlowestValues, tupleValue)
+		elif (fSeconds > self.lstSlowestValues[0][0]):
+			heapq.heapreplace(self.lstSlowestValues, tupleValue)
+	
+	#Take note of registry entries that were not formatted in this import (ex: they came from the cache). Only the roots can be counted.
+	def AddEntries(self, lstRegistryEntries):
+		for CurrentRegistryEntry in lstRegistryEntries:
+			self.counterRoots[dictRootNames.get(int(CurrentRegistryEntry.strRoot), str(CurrentRegistryEntry.strRoot))] += 1
+		self.iEntries += len(lstRegistryEntries)
+	
+	#Add the counts and the slowest values of another RegistryImportStats (ex: of a worker process). Its stages are not added, as they ran at the same time as ours.
+	def Merge(self, stats):
+		self.counterValueTypes.update(stats.counterValueTypes)
+		self.counterRoots.update(stats.counterRoots)
+		self.iEntries += stats.iEntries
+		for tupleValue in stats.lstSlowestValues:
+			if (len(self.lstSlowestValues) < self.iSlowestValues):
+				heapq.heappush(self.lstSlowestValues, tupleValue)
+			elif (tupleValue[0] > self.lstSlowestValues[0][0]):
+				heapq.heapreplace(self.lstSlowestValues, tupleValue)
+	
+	#The statistics as a dictionary that can be saved as JSON.
+	def ToDict(self):
+		return {
+			"total_seconds": round(time.perf_counter() - self.fStart, 6),
+			"stages": {strStage: round(fSeconds, 6) for strStage, fSeconds in self.dictStageSeconds.items()},
+			"entries": self.iEntries,
+			"value_types": dict(self.counterValueTypes.most_common()),
+			"roots": dict(self.counterRoots.most_common()),
+			"registry_bytes_read": self.iRegBytesRead,
+			"project_bytes_read": self.iProjectBytesRead,
+			"bytes_written": self.iBytesWritten,
+			"slowest_values": [{"seconds": round(fSeconds, 6), "type": strType, "root": dictRootNames.get(int(strRoot), strRoot), "key": strKey, "name": strName, "length": iLength} for fSeconds, strType, strRoot, strKey, strName, iLength in sorted(self.lstSlowestValues, reverse=True)],
+		}
+	
+	#The statistics as text.
+	def Report(self):
+		dictStats = self.ToDict()
+		lstLines = ["Import statistics:"]
+		for strStage, fSeconds in dictStats["stages"].items():
+			lstLines.append("    %-8s %9.3f s" % (strStage + ":", fSeconds))
+		lstLines.append("    %-8s %9.3f s" % ("total:", dictStats["total_seconds"]))
+		lstLines.append("    entries: %d" % self.iEntries)
+		if dictStats["value_types"]:
+			lstLines.append("    value types: " + ", ".join("%s %d" % tupleCount for tupleCount in dictStats["value_types"].items()))
+		lstLines.append("    roots: " + ", ".join("%s %d" % tupleCount for tupleCount in dictStats["roots"].items()))
+		lstLines.append("    read: %.2f MB of registry files, %.2f MB of project file" % (self.iRegBytesRead / 1e6, self.iProjectBytesRead / 1e6))
+		lstLines.append("    written: %.2f MB" % (self.iBytesWritten / 1e6))
+		if dictStats["slowest_values"]:
+			lstLines.append("    slowest values:")
+			for dictValue in dictStats["slowest_values"]:
+				lstLines.append("        %8.3f ms  %-7s %s\\%s  %s (%d characters)" % (dictValue["seconds"] * 1000, dictValue["type"], dictValue["root"], dictValue["key"], dictValue["name"], dictValue["length"]))
+		return "\n".join(lstLines)
+
+
+#Imports registry files into an AI project file.
+#The importer only holds its config, so it can be imported as a module and reused for any number of imports in one process.
+#If stats is a RegistryImportStats, everything the importer does is recorded in it.
+#Ex:
+	#importer = RegistryImporter(RegistryImportConfig("MyFile.reg", "MyAIProject.aip", "MyFileComponent", False, "32", "[APPDIR]"))
+	#importer.Import()
+class RegistryImporter:
+	
+	def __init__(self, config, stats=None):
+		self.config = config
+		self.stats = stats
+		self.formatSettings = GetRegFormatSettings(config.strComponentName, config.strComProperty, config.strComponentInstallDir, config.strPlatform)
+		self.cache = RegistryCache(config.strCacheDir, config.iCacheSize) if config.strCacheDir else None
+	
+	#Parse a registry file (the config's registry file by default) and return its RegistryEntryAI objects, formatted for AI.
+	#If the registry file is in the cache, it is not parsed at all.
+	def Parse(self, strRegFilePath=None):
+		strRegFilePath = strRegFilePath or self.config.strRegFilePath
+		lstRegistryEntries = self.GetCached(strRegFilePath)
+		if lstRegistryEntries is not None:
+			return lstRegistryEntries
+		
+		lstRegistryEntries = []
+		ParseRegistryFile(strRegFilePath, lstRegistryEntries, self.formatSettings, self.config.iJobs, self.stats)
+		self.PutCached(strRegFilePath, lstRegistryEntries)
+		return lstRegistryEntries
+	
+	#Return the RegistryEntryAI objects of a registry file from the cache, or None if it's not in the cache (or there is no cache).
+	def GetCached(self, strRegFilePath):
+		if not self.cache:
+			return None
+		fStart = time.perf_counter()
+		lstRegistryEntries = self.cache.Get(self.cache.GetKey(strRegFilePath, self.formatSettings), self.formatSettings)
+		if (lstRegistryEntries is not None and self.stats):
+			self.stats.AddStage("cache", time.perf_counter() - fStart)
+			self.stats.AddEntries(lstRegistryEntries)
+			self.stats.iRegBytesRead += os.path.getsize(strRegFilePath)
+		return lstRegistryEntries
+	
+	#Keep the RegistryEntryAI objects of a registry file in the cache, if there is one.
+	def PutCached(self, strRegFilePath, lstRegistryEntries):
+		if self.cache:
+			self.cache.Put(self.cache.GetKey(strRegFilePath, self.formatSettings), lstRegistryEntries)
+	
+	#Format RegistryEntryAI objects into AI's XML. Yields the ROW elements as they would be written to the AI project file (the config's project file by default),
+	#with the identifiers Insert() would give them (see AssignRegistryIds). Nothing is written.
+	def Format(self, lstRegistryEntries, strProjectFile=None):
+		AssignRegistryIds(lstRegistryEntries, strProjectFile or self.config.strProjectFile)
+		return FormatRegistryObjects(lstRegistryEntries)
+	
+	#Insert RegistryEntryAI objects into an AI project file (the config's project file by default). Returns False if it has no MsiRegsComponent table.
+	def Insert(self, lstRegistryEntries, strProjectFile=None):
+		return InsertRegistryEntries(lstRegistryEntries, strProjectFile or self.config.strProjectFile, self.config.bRemoveStale, stats=self.stats)
+	
+	#Import the config's registry file into the config's AI project file.
+	def Import(self):
+		self.Insert(self.Parse())
+	
+	#Compare the config's registry file with the ROWs of the component in the config's AI project file, without changing it. Yields the differences (see DiffRegistryEntries).
+	def Diff(self):
+		return DiffRegistryEntries(self.Parse(), self.config.strProjectFile, {self.config.strComponentName})
+
+		
+#Hash of this script. A cached registry file is only valid for the version of the script that formatted it.
+@functools.lru_cache(maxsize=None)
+def GetScriptHash():
+	with open(os.path.abspath(__file__), "rb") as scriptHandle:
+		return hashlib.sha256(scriptHandle.read()).digest()
+
+		
+#On-disk cache of parsed registry files, so registry files that did not change since the last build are not parsed again.
+#A cache file is keyed by a hash of the registry file, the format settings and this script.
+#It holds the formatted fields of the RegistryEntryAI objects, but not their identifiers, which are only given out on insertion.
+#Cache files are written atomically. Reading one touches it, and the least recently used ones are removed when the cache grows over iMaxSize bytes.
+class RegistryCache:
+	
+	def __init__(self, strCacheDir, iMaxSize=256 << 20):
+		self.strCacheDir = strCacheDir
+		self.iMaxSize = iMaxSize
+		os.makedirs(strCacheDir, exist_ok=True)
+	
+	#Return the key of a registry file, formatted with formatSettings.
+	def GetKey(self, strRegFilePath, formatSettings):
+		hashKey = hashlib.sha256(GetScriptHash())
+		hashKey.update(json.dumps([formatSettings.strComponentName, formatSettings.strComProperty, formatSettings.strComponentInstallDir, formatSettings.strPlatformKey]).encode("utf-8"))
+		with open(strRegFilePath, "rb") as regFileHandle:
+			for bytesChunk in iter(lambda: regFileHandle.read(1 << 20), b""):
+				hashKey.update(bytesChunk)
+		return hashKey.hexdigest()
+	
+	def GetPath(self, strCacheKey):
+		return os.path.join(self.strCacheDir, strCacheKey + ".regcache")
+	
+	#Return the RegistryEntryAI objects stored under strCacheKey, or None if they are not in the cache.
+	def Get(self, strCacheKey, formatSettings):
+		strCachePath = self.GetPath(strCacheKey)
+		try:
+			#marshal.load() reads a file in small pieces. Reading the whole file first is several times faster.
+			with open(strCachePath, "rb") as cacheHandle:
+				tupleFields = marshal.loads(cacheHandle.read())
+			os.utime(strCachePath)
+		except (OSError, EOFError, ValueError, TypeError):
+			return None
+		
+		#The fields are stored flat: root, key, name and value of the first entry, then of the second one, etc.
+		#The entries are created without calling __init__, as every field is set right after.
+		lstRegistryEntries = []
+		iterFields = iter(tupleFields)
+		for strRoot, strKey, strName, strValue in zip(iterFields, iterFields, iterFields, iterFields):
+			CurrentRegistryEntry = RegistryEntryAI.__new__(RegistryEntryAI)
+			CurrentRegistryEntry.strRegistry = ""
+			CurrentRegistryEntry.strRoot = strRoot
+			CurrentRegistryEntry.strKey = strKey
+			CurrentRegistryEntry.strName = strName
+			CurrentRegistryEntry.strValue = strValue
+			CurrentRegistryEntry.strComponent = formatSettings.strComponentName
+			lstRegistryEntries.append(CurrentRegistryEntry)
+		return lstRegistryEntries
+	
+	#Store RegistryEntryAI objects under strCacheKey, then evict the least recently used cache files.
+	#Keys are interned when they are parsed, and marshal writes an object it has already written as a reference, so each key is only stored once.
+	def Put(self, strCacheKey, lstRegistryEntries):
+		tupleFields = tuple(itertools.chain.from_iterable((CurrentRegistryEntry.strRoot, CurrentRegistryEntry.strKey, CurrentRegistryEntry.strName, CurrentRegistryEntry.strValue) for CurrentRegistryEntry in lstRegistryEntries))
+		
+		iTempHandle, strTempPath = tempfile.mkstemp(dir=self.strCacheDir, suffix=".tmp")
+		try:
+			with os.fdopen(iTempHandle, "wb") as cacheHandle:
+				marshal.dump(tupleFields, cacheHandle)
+			os.replace(strTempPath, self.GetPath(strCacheKey))
+		except OSError:
+			#The cache is only an optimization. A cache that can't be written is the same as no cache.
+			if os.path.exists(strTempPath):
+				os.remove(strTempPath)
+			return
+		
+		self.Evict()
+	
+	#Remove the least recently used cache files until the cache is under its maximum size.
+	def Evict(self):
+		lstCacheFiles = []
+		iTotalSize = 0
+		for entry in os.scandir(self.strCacheDir):
+			if entry.name.endswith(".regcache"):
+				try:
+					statResult = entry.stat()
+				except OSError:
+					continue
+				lstCacheFiles.append((statResult.st_mtime, statResult.st_size, entry.path))
+				iTotalSize += statResult.st_size
+		
+		lstCacheFiles.sort()
+		for fModified, iSize, strCachePath in lstCacheFiles:
+			if (iTotalSize <= self.iMaxSize):
+				break
+			try:
+				os.remove(strCachePath)
+			except OSError:
+				pass
+			iTotalSize -= iSize
+
 			
-		lstRegistryXMLEntries.append(strRegistryXMLEntryTemp)
+#Read a batch manifest and return a RegistryImportConfig for each registry file in it.
+#The manifest is a JSON list of objects, or a CSV file with a header row, with the following fields:
+	#RegFile - the registry file to import. Relative paths are relative to the manifest.
+	#Component - the component to attach the registry entries to.
+	#Platform - 32 or 64.
+	#InstallDir - optional - the installation directory property of the component. Defaults to "[APPDIR]".
+	#ComProperty - optional - true or false. Defaults to false.
+#Ex: [{"RegFile": "MyProgram.reg", "Component": "MyProgram.dll", "Platform": "64", "InstallDir": "[APPDIR]", "ComProperty": false}]
+def ReadBatchManifest(strManifestPath):
+	
+	with open(strManifestPath, newline="") as manifestHandle:
+		if strManifestPath.lower().endswith(".csv"):
+			lstRows = list(csv.DictReader(manifestHandle))
+		else:
+			lstRows = json.load(manifestHandle)
+	
+	strManifestDir = os.path.dirname(os.path.abspath(strManifestPath))
+	lstConfigs = []
+	for iRow, dictRow in enumerate(lstRows, 1):
+		config = RegistryImportConfig()
+		strRegFile = dictRow.get("RegFile") or ""
+		config.strRegFilePath = os.path.join(strManifestDir, strRegFile)
+		config.strComponentName = dictRow.get("Component", "")
+		config.strPlatform = str(dictRow.get("Platform", ""))
+		config.strComponentInstallDir = dictRow.get("InstallDir") or "[APPDIR]"
+		config.strComProperty = str(dictRow.get("ComProperty") or "false").lower()
+		
+		if(strRegFile == ""):
+			print ('Manifest entry', iRow, '- you must enter a registry file.')
+			sys.exit()
+		if(os.path.isfile(config.strRegFilePath) == False):
+			print ('Manifest entry', iRow, '- failed to find registry file', '\"'+config.strRegFilePath+'\".')
+			sys.exit()
+		if(config.strComponentName == ""):
+			print ('Manifest entry', iRow, '- you must enter a component name.')
+			sys.exit()
+		if(config.strPlatform != "64" and config.strPlatform != "32"):
+			print ('Manifest entry', iRow, '- you must enter a platform - 32 or 64.')
+			sys.exit()
+		if(not config.strComponentInstallDir.startswith('[') or not config.strComponentInstallDir.endswith(']')):
+			print ('Manifest entry', iRow, '- the installation directory should be in the format of an MSI property. For example, "[APPDIR]".')
+			sys.exit()
+		if(config.strComProperty != "true" and config.strComProperty != "false"):
+			print ('Manifest entry', iRow, '- ComProperty must be true or false.')
+			sys.exit()
+		config.strComProperty = (config.strComProperty == "true")
 		
+		lstConfigs.append(config)
 	
-#Insert registry XML into AI project file.
-#To do: use XML api for insertion
-def InsertRegistryEntries(lstRegistryXMLEntries):
-
-	strRegComponent = ""
-	for strLine in fileinput.input(strProjectFile, inplace=1):
-		#We've found the XML element containing the registry entries.
-		if "MsiRegsComponent" in strLine:	
-			strRegComponent = True
-		
-		#We want to append our registry entries to the end of the MsiRegsComponent XML element.
-		if ("</COMPONENT>" in strLine and strRegComponent == True):
-			for i in lstRegistryXMLEntries:
-				print ("    "+i)
-			strRegComponent = False
+	return lstConfigs
+
+	
+#Same as ParseRegistryImportGroup, but also returns the RegistryImportStats of the group. This runs in a worker process of ParseRegistryBatch.
+def ParseRegistryImportJobStats(lstConfigs):
+	stats = RegistryImportStats()
+	return ParseRegistryImportGroup(lstConfigs, stats), stats
+
+	
+#Parse the registry file of configs that all import the same registry file, into different components, platforms or COM properties.
+#The registry file is only parsed once for all of them (see ParseRegistryFileTargets). Configs whose registry entries are in the cache are not parsed at all.
+#Returns the RegistryEntryAI objects of each config, in the order of the configs. This is what a worker process of ParseRegistryBatch runs.
+def ParseRegistryImportGroup(lstConfigs, stats=None):
+	
+	lstImporters = [RegistryImporter(config, stats) for config in lstConfigs]
+	lstResults = [importer.GetCached(importer.config.strRegFilePath) for importer in lstImporters]
+	lstParsed = [importer for importer, lstRegistryEntries in zip(lstImporters, lstResults) if lstRegistryEntries is None]
+	
+	#The configs of a group come from a single command line (or are in a batch, where they are parsed with iJobs=1), so they all have the same iJobs.
+	lstParsedEntries = []
+	if lstParsed:
+		lstParsedEntries = ParseRegistryFileTargets(lstConfigs[0].strRegFilePath, [importer.formatSettings for importer in lstParsed], lstParsed[0].config.iJobs, stats)
+	for importer, lstRegistryEntries in zip(lstParsed, lstParsedEntries):
+		importer.PutCached(importer.config.strRegFilePath, lstRegistryEntries)
+	
+	iterParsedEntries = iter(lstParsedEntries)
+	return [next(iterParsedEntries) if lstRegistryEntries is None else lstRegistryEntries for lstRegistryEntries in lstResults]
+
+	
+#Parse every registry file of the batch. Returns the RegistryEntryAI objects of each config, in manifest order.
+#The registry files are parsed at the same time in a process pool. iJobs is the number of worker processes (None uses every CPU).
+#A registry file that is imported more than once (ex: into a 32-bit and a 64-bit component) is only parsed once (see ParseRegistryImportGroup).
+#If stats is a RegistryImportStats, the parsing of the registry files is recorded in it as a single "parse" stage.
+def ParseRegistryBatch(lstConfigs, iJobs=None, stats=None):
+	
+	fStart = time.perf_counter()
+	
+	#Group the configs by registry file, in the order each registry file first shows up.
+	dictGroups = {}
+	for iConfig, config in enumerate(lstConfigs):
+		dictGroups.setdefault(os.path.normcase(os.path.abspath(config.strRegFilePath)), []).append(iConfig)
+	lstGroups = [[lstConfigs[iConfig] for iConfig in lstGroup] for lstGroup in dictGroups.values()]
+	
+	ParseJob = ParseRegistryImportJobStats if stats else ParseRegistryImportGroup
+	if (iJobs == 1 or len(lstGroups) < 2):
+		lstGroupResults = [ParseJob(lstGroup) for lstGroup in lstGroups]
+	else:
+		with concurrent.futures.ProcessPoolExecutor(max_workers=iJobs) as executor:
+			lstGroupResults = list(executor.map(ParseJob, lstGroups))
+	
+	if stats:
+		stats.AddStage("parse", time.perf_counter() - fStart)
+		for lstJobEntries, jobStats in lstGroupResults:
+			stats.Merge(jobStats)
+			stats.iRegBytesRead += jobStats.iRegBytesRead
+		lstGroupResults = [lstJobEntries for lstJobEntries, jobStats in lstGroupResults]
+	
+	#Put the registry entries of every config back in manifest order.
+	lstResults = [None] * len(lstConfigs)
+	for lstGroup, lstJobEntries in zip(dictGroups.values(), lstGroupResults):
+		for iConfig, lstRegistryEntries in zip(lstGroup, lstJobEntries):
+			lstResults[iConfig] = lstRegistryEntries
+	return lstResults
+
+	
+#Import every registry file of the batch into the AI project file, with a single rewrite of the project file.
+#The registry files are parsed the same way as ParseRegistryBatch does, with iJobs worker processes.
+#If stats is a RegistryImportStats, the batch is recorded in it.
+#Returns False if the project file has no MsiRegsComponent table.
+def ImportRegistryBatch(lstConfigs, strProjectFile, iJobs=None, bRemoveStale=False, stats=None):
+	
+	lstResults = ParseRegistryBatch(lstConfigs, iJobs, stats)
+	
+	#Identifiers are given out in manifest order when the entries are inserted, so a component imported from several registry files gets a single sequence of identifiers.
+	return InsertRegistryEntries(list(itertools.chain.from_iterable(lstResults)), strProjectFile, bRemoveStale, stats=stats)
+
+	
+#Split a registry file into the smallest pieces that can each be parsed on their own: one or more whole registry blocks (see ReadRegistryFileChunks).
+#Each piece but the last keeps a "\n" to end its last line, the same way the blank line after it did.
+def SplitRegistryFile(strRegFilePath):
+	with OpenRegistryFile(strRegFilePath) as regFileHandle:
+		lstBlocks = regFileHandle.read().split("\n\n")
+	for iBlock in range(len(lstBlocks) - 1):
+		lstBlocks[iBlock] += "\n"
+	return lstBlocks
+
+		
+#Keeps an AI project file up to date with registry files while they are being edited.
+#The registry files are polled for changes. When one changes, only the registry blocks that changed are parsed again,
+#and only the ROWs of those blocks whose value changed, that are new, or that are not in the registry files anymore are written to the project file.
+#Changes are applied once a file has not changed for fDebounce seconds, so a file that is still being saved is not imported half-written.
+#The project file is written the same way as a normal import, so every write is atomic.
+#If a write fails (ex: the project file is open in another program), the changes are kept and written again every fRetry seconds, or on the next change.
+#Ex:
+	#RegistryWatcher([RegistryImportConfig("MyFile.reg", "MyAIProject.aip", "MyFileComponent", False, "32", "[APPDIR]")], "MyAIProject.aip").Run()
+class RegistryWatcher:
+	
+	def __init__(self, lstConfigs, strProjectFile, fInterval=0.2, fDebounce=0.3, fRetry=2.0):
+		self.lstConfigs = lstConfigs
+		self.strProjectFile = strProjectFile
+		self.fInterval = fInterval
+		self.fDebounce = fDebounce
+		self.fRetry = fRetry
+		self.lstFormatSettings = [GetRegFormatSettings(config.strComponentName, config.strComProperty, config.strComponentInstallDir, config.strPlatform) for config in lstConfigs]
+		self.lstFileStats = [None] * len(lstConfigs)			#(modification time, size) of each registry file when it was last read.
+		self.lstFileBlocks = [[] for config in lstConfigs]		#Pieces of each registry file (see SplitRegistryFile), in file order.
+		self.lstFileBlockCounts = [collections.Counter() for config in lstConfigs]	#Number of times each piece is in each registry file.
+		self.lstBlockEntries = [{} for config in lstConfigs]	#RegistryEntryAI objects of each piece of each registry file.
+		self.counterRowKeys = collections.Counter()				#Number of entries with each GetRegistryRowKey in all the registry files.
+		self.dictRowValues = {}									#Value of every ROW in the project file that came from the registry files, by GetRegistryRowKey.
+		self.setUnappliedKeys = set()							#GetRegistryRowKey of the entries whose change could not be written to the project file yet.
+		self.bUnappliedRemoveStale = False						#The stale ROWs could not be removed from the project file yet.
+	
+	#Return the (modification time, size) of a file, or None if it doesn't exist right now (some editors delete the file before saving it again).
+	def GetFileStat(self, strPath):
+		try:
+			statResult = os.stat(strPath)
+		except OSError:
+			return None
+		return (statResult.st_mtime_ns, statResult.st_size)
+	
+	#Parse registry file iFile again. Pieces that did not change since the last time keep their RegistryEntryAI objects.
+	#Returns the entries of the pieces that are gone, and the entries of the pieces that are new.
+	def LoadFile(self, iFile):
+		dictOldEntries = self.lstBlockEntries[iFile]
+		lstBlocks = SplitRegistryFile(self.lstConfigs[iFile].strRegFilePath)
+		dictBlockEntries = {}
+		for strBlock in lstBlocks:
+			if strBlock not in dictBlockEntries:
+				lstEntries = dictOldEntries.get(strBlock)
+				if lstEntries is None:
+					lstEntries = ParseRegistryChunk(strBlock, [self.lstFormatSettings[iFile]])[0]
+				dictBlockEntries[strBlock] = lstEntries
+		
+		#A piece can be in a file more than once, so the pieces are compared as multisets.
+		#Counter's "-" operator is slow on large counters, and almost every piece is in both, so the counts are compared here.
+		counterOldBlocks = self.lstFileBlockCounts[iFile]
+		counterBlocks = collections.Counter(lstBlocks)
+		lstRemovedEntries = []
+		for strBlock, iCount in counterOldBlocks.items():
+			if (iCount > counterBlocks[strBlock]):
+				lstRemovedEntries.extend(dictOldEntries[strBlock] * (iCount - counterBlocks[strBlock]))
+		lstAddedEntries = []
+		for strBlock, iCount in counterBlocks.items():
+			if (iCount > counterOldBlocks[strBlock]):
+				lstAddedEntries.extend(dictBlockEntries[strBlock] * (iCount - counterOldBlocks[strBlock]))
+		
+		for CurrentRegistryEntry in lstRemovedEntries:
+			tupleRowKey = GetRegistryRowKey(CurrentRegistryEntry)
+			self.counterRowKeys[tupleRowKey] -= 1
+			if (self.counterRowKeys[tupleRowKey] == 0):
+				del self.counterRowKeys[tupleRowKey]
+		self.counterRowKeys.update(GetRegistryRowKey(CurrentRegistryEntry) for CurrentRegistryEntry in lstAddedEntries)
+		
+		self.lstFileBlocks[iFile] = lstBlocks
+		self.lstFileBlockCounts[iFile] = counterBlocks
+		self.lstBlockEntries[iFile] = dictBlockEntries
+		return lstRemovedEntries, lstAddedEntries
+	
+	#Write the changes of the pieces that are gone or new to the project file, along with the changes that could not be written before.
+	#Returns the number of changed and removed ROWs, or None if the project file has no MsiRegsComponent table.
+	#If it returns None or raises (ex: PermissionError), the changes are kept for the next Apply.
+	def Apply(self, lstRemovedEntries, lstAddedEntries, bRemoveStale=False):
+		setRowKeys = set(GetRegistryRowKey(CurrentRegistryEntry) for CurrentRegistryEntry in itertools.chain(lstRemovedEntries, lstAddedEntries))
+		bRetry = bool(self.setUnappliedKeys)
+		setRowKeys.update(self.setUnappliedKeys)
+		bRemoveStale = bRemoveStale or self.bUnappliedRemoveStale
+		
+		#Number of entries of each key before the change.
+		counterOldRowKeys = collections.Counter(GetRegistryRowKey(CurrentRegistryEntry) for CurrentRegistryEntry in lstRemovedEntries)
+		counterOldRowKeys.subtract(GetRegistryRowKey(CurrentRegistryEntry) for CurrentRegistryEntry in lstAddedEntries)
+		
+		dictRows = {}
+		if not bRetry and all(self.counterRowKeys[tupleRowKey] <= 1 and self.counterRowKeys[tupleRowKey] + counterOldRowKeys[tupleRowKey] <= 1 for tupleRowKey in setRowKeys):
+			#Every key that changed is only in one place, before and after the change, so the new entries are all there is to write.
+			for CurrentRegistryEntry in lstAddedEntries:
+				dictRows[GetRegistryRowKey(CurrentRegistryEntry)] = CurrentRegistryEntry
+		else:
+			#Some key is in more than one place, or the changes of an earlier Apply are written again. The last value of a (Root, Key, Name, Component_) wins, like in InsertRegistryEntries.
+			for iFile, lstBlocks in enumerate(self.lstFileBlocks):
+				for strBlock in lstBlocks:
+					for CurrentRegistryEntry in self.lstBlockEntries[iFile][strBlock]:
+						tupleRowKey = GetRegistryRowKey(CurrentRegistryEntry)
+						if tupleRowKey in setRowKeys:
+							dictRows[tupleRowKey] = CurrentRegistryEntry
+		
+		lstChangedEntries = [CurrentRegistryEntry for tupleRowKey, CurrentRegistryEntry in dictRows.items() if self.dictRowValues.get(tupleRowKey) != CurrentRegistryEntry.strValue]
+		setRemovedKeys = set(tupleRowKey for tupleRowKey in setRowKeys if tupleRowKey not in self.counterRowKeys and tupleRowKey in self.dictRowValues)
+		if (lstChangedEntries or setRemovedKeys or bRemoveStale):
+			#Until the project file is written, it doesn't have the changes of these keys.
+			self.setUnappliedKeys = setRowKeys
+			self.bUnappliedRemoveStale = bRemoveStale
+			if not InsertRegistryEntries(lstChangedEntries, self.strProjectFile, bRemoveStale, setRemovedKeys):
+				return None
+		self.setUnappliedKeys = set()
+		self.bUnappliedRemoveStale = False
+		
+		for CurrentRegistryEntry in lstChangedEntries:
+			self.dictRowValues[GetRegistryRowKey(CurrentRegistryEntry)] = CurrentRegistryEntry.strValue
+		for tupleRowKey in setRemovedKeys:
+			del self.dictRowValues[tupleRowKey]
+		return len(lstChangedEntries), len(setRemovedKeys)
+
+	#Apply the changes, and print why if the project file could not be written. Returns what Apply returns, or None if it failed.
+	def TryApply(self, lstRemovedEntries, lstAddedEntries, bRemoveStale=False):
+		try:
+			return self.Apply(lstRemovedEntries, lstAddedEntries, bRemoveStale)
+		except OSError as e:
+			print ('Failed to write AI project file', '\"'+self.strProjectFile+'\":', e)
+			return None
+	
+	#Import every registry file, then keep applying their changes until the process is interrupted (Ctrl+C).
+	def Run(self, bRemoveStale=False):
+		lstAddedEntries = []
+		for iFile, config in enumerate(self.lstConfigs):
+			self.lstFileStats[iFile] = self.GetFileStat(config.strRegFilePath)
+			lstAddedEntries.extend(self.LoadFile(iFile)[1])
+		fRetryTime = None		#When to write the changes that could not be written again, if no registry file changes before.
+		if self.TryApply([], lstAddedEntries, bRemoveStale) is None:
+			fRetryTime = time.monotonic() + self.fRetry
+		print ('Watching', len(self.lstConfigs), 'registry file(s) for changes to', '\"'+self.strProjectFile+'\".', 'Press Ctrl+C to stop.')
+		
+		dictPending = {}		#Registry files that changed, and when they were last seen changing.
+		try:
+			while True:
+				time.sleep(self.fInterval)
+				fNow = time.monotonic()
+				for iFile, config in enumerate(self.lstConfigs):
+					tupleStat = self.GetFileStat(config.strRegFilePath)
+					if (tupleStat is not None and tupleStat != self.lstFileStats[iFile]):
+						self.lstFileStats[iFile] = tupleStat
+						dictPending[iFile] = fNow
+				
+				lstReady = [iFile for iFile, fChanged in dictPending.items() if fNow - fChanged >= self.fDebounce]
+				if (not lstReady and (fRetryTime is None or fNow < fRetryTime)):
+					continue
 				
-		print (strLine, end="")
+				fStart = time.perf_counter()
+				lstRemovedEntries = []
+				lstAddedEntries = []
+				for iFile in lstReady:
+					del dictPending[iFile]
+					try:
+						lstFileRemoved, lstFileAdded = self.LoadFile(iFile)
+					except (OSError, ValueError) as e:
+						#Keep the entries of the last good version of the file, and try again on its next change.
+						print ('Failed to parse registry file', '\"'+self.lstConfigs[iFile].strRegFilePath+'\":', e)
+						continue
+					lstRemovedEntries.extend(lstFileRemoved)
+					lstAddedEntries.extend(lstFileAdded)
+				tupleApplied = self.TryApply(lstRemovedEntries, lstAddedEntries)
+				if tupleApplied is None:
+					fRetryTime = fNow + self.fRetry
+					continue
+				fRetryTime = None
+				iChanged, iRemoved = tupleApplied
+				if (iChanged or iRemoved):
+					print ('Updated', '\"'+self.strProjectFile+'\":', iChanged, 'changed,', iRemoved, 'removed registry entries in %.0f ms.' % ((time.perf_counter() - fStart) * 1000))
+		except KeyboardInterrupt:
+			pass
 
+			
+#Read the ROWs of the MsiRegsComponent table of an AI project file that belong to one of the components, in file order.
+#Yields a RegistryEntryAI object for every ROW, with its strings unescaped (see UnescapeXmlAttribute), so they are the same as the ones of an import.
+#The project file is mapped and read one line at a time, so the memory used does not grow with the size of the table.
+def ReadRegistryRows(strProjectFile, setComponents):
 	
-#Main{}
+	with MapRegistryTable(strProjectFile) as tupleProject:
+		if tupleProject is None:
+			return
+		projectMap, iTableStart, iTableEnd, statProject = tupleProject
+		
+		setComponentAttributes = set(EscapeXmlAttribute(strComponent).encode("utf-8") for strComponent in setComponents)
+		for iRowStart, iLineEnd in ReadTableLines(projectMap, iTableStart, iTableEnd):
+			strLine = projectMap[iRowStart:iLineEnd]
+			if b"<ROW " not in strLine:
+				continue
+			dictAttributes = dict(patternXmlAttribute.findall(strLine))
+			if dictAttributes.get(b"Component_", b"") not in setComponentAttributes:
+				continue
+			
+			CurrentRegistryEntry = RegistryEntryAI()
+			CurrentRegistryEntry.strRegistry = UnescapeXmlAttribute(dictAttributes.get(b"Registry", b""))
+			strRoot = UnescapeXmlAttribute(dictAttributes.get(b"Root", b"0"))
+			CurrentRegistryEntry.strRoot = int(strRoot) if strRoot.isdigit() else strRoot
+			CurrentRegistryEntry.strKey = UnescapeXmlAttribute(dictAttributes.get(b"Key", b""))
+			CurrentRegistryEntry.strName = UnescapeXmlAttribute(dictAttributes.get(b"Name", b""))
+			CurrentRegistryEntry.strValue = UnescapeXmlAttribute(dictAttributes.get(b"Value", b""))
+			CurrentRegistryEntry.strComponent = UnescapeXmlAttribute(dictAttributes[b"Component_"])
+			yield CurrentRegistryEntry
+
+
+#Write bytes as the comma separated hex of a registry value, the way regedit does: lines of about 80 characters,
+#each one ending with a "\" that continues the value on the next line, which is indented by two spaces.
+#strStart is what comes before the hex on the first line. Ex: "\"Data\"=hex:"
+def FormatRegHex(strStart, data, strNewLine):
+	
+	iFirstLine = max((77 - len(strStart)) // 3, 1)
+	lstLines = [data[:iFirstLine].hex(",")]
+	for iStart in range(iFirstLine, len(data), 25):
+		lstLines.append(data[iStart:iStart + 25].hex(","))
+	return strStart + (",\\" + strNewLine + "  ").join(lstLines)
+
+
+#AI escapes in a string value (Ex: "[\[]"), properties (Ex: "[APPDIR]"), and quotes, which are escaped in a registry file.
+patternAIRegString = re.compile(r'\[\\(.)\]|\[([^\[\]\\]*)\]|"')
+
+#Turn a registry entry of the project file back into its line of a registry file, without the line break. This is the reverse of FormatAIRegEntry.
+#dictInstallPaths maps installation directory properties to the paths they stand for, as they are written in a registry file. Ex: {"[APPDIR]": "C:\\\\Program Files\\\\MyProduct\\\\"}
+#Other properties are written as they are.
+#Some of the formatting can't be undone: "[PLATFORM]" in keys, and the "\win32]" and "\win64]" of values, are written for the platform of the component.
+#Ex: "AppID"="{00000000-0000-0000-0000-000000000000}", @=dword:0000000a, "Data"=hex:01,02
+def FormatRegEntryLine(CurrentRegistryEntry, dictInstallPaths, strNewLine="\r\n"):
+	
+	strValue = CurrentRegistryEntry.strValue
+	strStart = ("\"" + CurrentRegistryEntry.strName + "\"=") if CurrentRegistryEntry.strName != "" else "@="
+	
+	if strValue.startswith("#x"):
+		try:
+			return FormatRegHex(strStart + "hex:", bytes.fromhex(strValue[2:]), strNewLine)
+		except ValueError:
+			pass
+	elif strValue.startswith("#%"):
+		return FormatRegHex(strStart + "hex(2):", (strValue[2:] + "\0").encode("utf-16-le"), strNewLine)
+	elif (strValue[1:].isdigit() and strValue.startswith("#") and int(strValue[1:]) <= 0xffffffff):
+		return strStart + "dword:%08x" % int(strValue[1:])
+	elif "[~]" in strValue:
+		#Every string of a multi string value ends with "[~]", and the list ends with an extra null character.
+		return FormatRegHex(strStart + "hex(7):", (strValue.replace("[~]", "\0") + "\0").encode("utf-16-le"), strNewLine)
+	
+	def ReplaceEscape(m):
+		if m.group(1) is not None:
+			return m.group(1)
+		if m.group(2) is not None:
+			return dictInstallPaths.get(m.group(0), m.group(0))
+		return "\\\""
+	return strStart + "\"" + patternAIRegString.sub(ReplaceEscape, strValue) + "\""
+
+
+#Write the ROWs of the components back into a registry file, the way regedit exports it: UTF-16LE with a BOM, "Windows Registry Editor Version 5.00" and CRLF line breaks.
+#The ROWs are read and written one at a time (see ReadRegistryRows), so a project file of any size is exported with the same memory.
+#The values of a key are written under a single [key] line as long as they follow each other in the project file, which is how an import writes them.
+#dictInstallPaths - see FormatRegEntryLine. The paths are given as they are on disk (Ex: "C:\Program Files\MyProduct"), and escaped for the registry file here.
+#Returns the number of ROWs written, and the number of ROWs skipped because their root is not a registry hive (see dictRootNames).
+#Ex:
+	#ExportRegistryRows("MyAIProject.aip", ["MyFileComponent"], "MyFile.reg", {"[APPDIR]": "C:\\Program Files\\MyProduct"})
+def ExportRegistryRows(strProjectFile, lstComponents, strRegFilePath, dictInstallPaths=None):
+	
+	dictRegInstallPaths = {}
+	for strProperty, strPath in (dictInstallPaths or {}).items():
+		dictRegInstallPaths[strProperty] = strPath.rstrip("\\").replace("\\", "\\\\") + "\\\\"
+	
+	iWritten = 0
+	iSkipped = 0
+	tupleLastKey = None
+	with open(strRegFilePath, "w", encoding="utf-16-le", newline="", buffering=1 << 20) as regFileHandle:
+		regFileHandle.write("\ufeffWindows Registry Editor Version 5.00\r\n")
+		for CurrentRegistryEntry in ReadRegistryRows(strProjectFile, set(lstComponents)):
+			strRoot = dictRootNames.get(CurrentRegistryEntry.strRoot)
+			if strRoot is None:
+				iSkipped += 1
+				continue
+			
+			#The import adds "[COM_PROP1]" after the first part of the key (see GetRegKey).
+			strKey = CurrentRegistryEntry.strKey.replace("[COM_PROP1]", "", 1)
+			tupleKey = (strRoot, strKey)
+			if (tupleKey != tupleLastKey):
+				regFileHandle.write("\r\n[" + strRoot + ("\\" + strKey if strKey else "") + "]\r\n")
+				tupleLastKey = tupleKey
+			#A key without values.
+			if (CurrentRegistryEntry.strName != "+"):
+				regFileHandle.write(FormatRegEntryLine(CurrentRegistryEntry, dictRegInstallPaths) + "\r\n")
+			iWritten += 1
+		regFileHandle.write("\r\n")
+	
+	return iWritten, iSkipped
+
+
+#Compare registry entries (as RegistryImporter.Parse returns them) with the ROWs of their components in an AI project file, by (Root, Key, Name, Component_).
+#Both sides are compared in the format of AI, so nothing is lost converting one into the other. Values are compared with IsSameRegistryValue.
+#The ROWs are read one at a time, and looking each one up is a single dictionary lookup.
+#setComponents are the components whose ROWs are compared. Defaults to the components of the registry entries.
+#Yields (strChange, CurrentRegistryEntry, strProjectValue): strChange is "+" (only in the registry entries), "-" (only in the project file) or "~" (the value is different).
+#The changed and removed ROWs come first, in the order of the project file, then the new entries, in their own order.
+def DiffRegistryEntries(lstRegistryEntries, strProjectFile, setComponents=None):
+	
+	#The last value of a key wins, like in InsertRegistryEntries.
+	dictNewEntries = {}
+	for CurrentRegistryEntry in lstRegistryEntries:
+		dictNewEntries[GetRegistryRowKey(CurrentRegistryEntry)] = CurrentRegistryEntry
+	
+	if setComponents is None:
+		setComponents = set(tupleRowKey[3] for tupleRowKey in dictNewEntries)
+	for ProjectRegistryEntry in ReadRegistryRows(strProjectFile, setComponents):
+		CurrentRegistryEntry = dictNewEntries.pop(GetRegistryRowKey(ProjectRegistryEntry), None)
+		if CurrentRegistryEntry is None:
+			yield "-", ProjectRegistryEntry, ProjectRegistryEntry.strValue
+		elif not IsSameRegistryValue(CurrentRegistryEntry.strValue, ProjectRegistryEntry.strValue):
+			yield "~", CurrentRegistryEntry, ProjectRegistryEntry.strValue
+	
+	for CurrentRegistryEntry in dictNewEntries.values():
+		yield "+", CurrentRegistryEntry, None
+
+
+#Print the differences of DiffRegistryEntries, one per line. Returns the number of differences.
+#Ex: ~ HKEY_CLASSES_ROOT\CLSID\{12345678-1234-1234-1234-123456789ABC} "ThreadingModel": "Apartment" -> "Both"
+def PrintRegistryDiff(iterDiff):
+	
+	iDifferences = 0
+	for strChange, CurrentRegistryEntry, strProjectValue in iterDiff:
+		strEntry = strChange + " " + dictRootNames.get(CurrentRegistryEntry.strRoot, str(CurrentRegistryEntry.strRoot)) + "\\" + CurrentRegistryEntry.strKey + " " + ("@" if CurrentRegistryEntry.strName == "" else "\"" + CurrentRegistryEntry.strName + "\"")
+		if (strChange == "~"):
+			print (strEntry + ": \"" + strProjectValue + "\" -> \"" + CurrentRegistryEntry.strValue + "\"")
+		else:
+			print (strEntry + ": \"" + CurrentRegistryEntry.strValue + "\"")
+		iDifferences += 1
+	return iDifferences
+
+
+#Read the command line arguments into the config of the import.
+def ReadArguments(lstArguments):
+
+	config = RegistryImportConfig()
+	
+	#First command line argument is the registry file that we want to import into the AI project file.
+	config.strRegFilePath = lstArguments[1]
+	if(os.path.exists(config.strRegFilePath) == False):
+		print ('Failed to find registry file', '\"'+config.strRegFilePath+'\".')
+		sys.exit()
+	
+	#Second command line argument is the AI project file.
+	config.strProjectFile = lstArguments[2]
+	if(os.path.exists(config.strProjectFile) == False):
+		print ('Failed to find AI project file', '\"'+config.strProjectFile+'\".')
+		sys.exit()	
+
+	#Third command line argument is the component you wish to import all the registry entries into.
+	config.strComponentName = lstArguments[3]
+	if(config.strComponentName == ""):
+		print ('You must enter a component name')
+		sys.exit()		
+	
+	#Fourth command line argument is whether you want to add [COM_PROP1] to the registry entries. Must be 'true' or 'false'.
+	if lstArguments[4] == "true":
+		config.strComProperty = True
+	elif lstArguments[4] == "false":
+		config.strComProperty = False
+	else:
+		print ('ComProperty must be true or false.')
+		sys.exit()	
+
+	#Fifth command line argument is whether the registry entries are being made to the 32bit or 64bit registry.
+	#Even though the component's "64-bit" flag determines which hive the entries are to be made,
+	#Some registry keys have values that need to be adjusted. For example \win32 vs \win64
+	config.strPlatform = lstArguments[5]
+	if(config.strPlatform != "64" and config.strPlatform != "32"):
+		print ('You must enter a platform - 32 or 64.')
+		sys.exit()		
+
+	#Installation directory of the component. Use the property name of the installation folder. 
+	#For most files, this will be "[APPDIR]". 
+	#However, some installations might install to folders outside of APPDIR. 
+	#For example, your program might install files to C:\MyFolder, which has the property name "[MYFOLDER]"
+	config.strComponentInstallDir = lstArguments[6]
+	if(config.strComponentInstallDir == ""):
+		print ('You must enter a the installation directory property of the component. For most components, this will be "[APPDIR]"')	
+		sys.exit()		
+	else:
+		if(not config.strComponentInstallDir.startswith('[') or not config.strComponentInstallDir.endswith(']')):
+			print ('Component installation directory is not in the correct format.')	
+			print ('The installation directory should be in the format of an MSI property. For example, "[APPDIR]".')	
+			sys.exit()
+			
+	return config
 
-#List of RegistryEntryAI objects
-lstRegistryEntries = []
+	
+#Read the targets that come after the first one on the command line: groups of ComponentName ComProperty Platform ComponentInstallDir, the same as the first target.
+#Returns a config for each of them, with the same registry file and AI project file as the first one.
+def ReadTargetArguments(lstArguments):
+
+	if ((len(lstArguments) - 7) % 4 != 0):
+		print ('Every target must have a ComponentName, ComProperty, Platform and ComponentInstallDir.')
+		sys.exit()
+	
+	return [ReadArguments(lstArguments[:3] + lstArguments[iTarget:iTarget + 4]) for iTarget in range(7, len(lstArguments), 4)]
+
+	
+#Read the command line arguments of the batch mode. Returns the configs of the manifest, the AI project file and the number of jobs.
+def ReadBatchArguments(lstArguments):
+
+	if (len(lstArguments) < 4):
+		print ('Usage: Import_Reg.py --batch Manifest.json AdvancedInstallerProjectFile.aip [Jobs]')
+		sys.exit()
+	
+	strManifestPath = lstArguments[2]
+	if(os.path.exists(strManifestPath) == False):
+		print ('Failed to find batch manifest', '\"'+strManifestPath+'\".')
+		sys.exit()
+	
+	strProjectFile = lstArguments[3]
+	if(os.path.exists(strProjectFile) == False):
+		print ('Failed to find AI project file', '\"'+strProjectFile+'\".')
+		sys.exit()
+	
+	iJobs = None
+	if (len(lstArguments) > 4):
+		if (not lstArguments[4].isdigit() or int(lstArguments[4]) < 1):
+			print ('Jobs must be a positive number.')
+			sys.exit()
+		iJobs = int(lstArguments[4])
+	
+	return ReadBatchManifest(strManifestPath), strProjectFile, iJobs
+
+	
+#Read the command line arguments of the export mode. Returns the AI project file, the registry file to write and the components.
+def ReadExportArguments(lstArguments):
+
+	if (len(lstArguments) < 5):
+		print ('Usage: Import_Reg.py --export AdvancedInstallerProjectFile.aip Output.reg ComponentName [ComponentName ...]')
+		sys.exit()
+	
+	strProjectFile = lstArguments[2]
+	if(os.path.exists(strProjectFile) == False):
+		print ('Failed to find AI project file', '\"'+strProjectFile+'\".')
+		sys.exit()
+	
+	return strProjectFile, lstArguments[3], lstArguments[4:]
 
-#List of RegistryEntryAI objects formatted in AI's XML format (to be written to the AI project file)
-lstRegistryXMLEntries = []
+	
+#Exit with an error if an option of the command line does nothing in the mode that was chosen, instead of ignoring it.
+#setOptions are the options of the command line, setModeOptions the ones the mode uses. Ex: CheckOptions({"--watch", "--jobs"}, {"--watch", "--remove-stale"}, "--watch")
+def CheckOptions(setOptions, setModeOptions, strMode):
+	for strOption in sorted(setOptions - setModeOptions):
+		print (strOption, 'can\'t be used with', strMode+'.')
+		sys.exit()
 
-#The suffix that will be added to the 'registry' value in the RegistryEntryAI class (see the "RegistryEntryAI" class comments). 
-#To Do: write a function to automatically detect the iIdentifierNumber based on the registry entries that already exist.
-iIdentifierNumber = 0;
+		
+#Print the statistics of an import, if they were asked for on the command line.
+def PrintStats(stats, strStats):
+	if (strStats == "--stats"):
+		print (stats.Report())
+	elif (strStats == "--stats-json"):
+		print (json.dumps(stats.ToDict(), indent=2))
 
-#Parse registry file and create RegistryEntryAI object that represent registry entries being inserted into the AI project.
-ParseRegistryFile(lstRegistryEntries)
+		
+#Main{}
+#The command line is a thin wrapper around RegistryImporter.
+def main():
 
-#Take the RegistryEntryAI objects we generated, and format them into XML formatted to AI's standards.
-FormatRegistryObjects(lstRegistryEntries, lstRegistryXMLEntries)
+	#Options can be anywhere on the command line.
+	#--remove-stale: remove the ROWs of the component that are not in the registry file anymore.
+	#--jobs N: parse the registry file in N processes. 
+	#--cache Directory: keep parsed registry files in a cache directory, so unchanged registry files are not parsed again.
+	#--cache-size MB: the size the cache directory is kept under. Defaults to 256.
+	#--watch: keep running, and apply the changes of the registry files to the AI project file as soon as they are saved.
+	#--stats, --stats-json: print the statistics of the import (see RegistryImportStats) when it's done, as text or as JSON.
+	#--diff: print the differences between the registry file and the AI project file (see DiffRegistryEntries), instead of importing.
+	#--install-path Property=Path: export mode only - the path an installation directory property is written as.
+	#An option that does nothing in the mode that was chosen is an error (see CheckOptions).
+	lstArguments = []
+	setOptions = set()
+	bRemoveStale = False
+	bWatch = False
+	bDiff = False
+	strStats = None
+	dictInstallPaths = {}
+	iJobs = 1
+	strCacheDir = None
+	iCacheSize = 256 << 20
+	iArgument = 0
+	while iArgument < len(sys.argv):
+		strArgument = sys.argv[iArgument]
+		iArgument += 1
+		if (strArgument == "--remove-stale"):
+			bRemoveStale = True
+		elif (strArgument == "--watch"):
+			bWatch = True
+		elif (strArgument in ("--stats", "--stats-json")):
+			strStats = strArgument
+		elif (strArgument == "--diff"):
+			bDiff = True
+		elif (strArgument == "--install-path"):
+			if (iArgument == len(sys.argv) or not sys.argv[iArgument].startswith("[") or "]=" not in sys.argv[iArgument]):
+				print ('--install-path must be followed by a property and a path. Ex: [APPDIR]=C:\\MyFolder')
+				sys.exit()
+			strProperty, strPath = sys.argv[iArgument].split("=", 1)
+			dictInstallPaths[strProperty] = strPath
+			iArgument += 1
+		elif (strArgument in ("--jobs", "--cache-size")):
+			if (iArgument == len(sys.argv) or not sys.argv[iArgument].isdigit() or int(sys.argv[iArgument]) < 1):
+				print (strArgument, 'must be followed by a positive number.')
+				sys.exit()
+			if (strArgument == "--jobs"):
+				iJobs = int(sys.argv[iArgument])
+			else:
+				iCacheSize = int(sys.argv[iArgument]) << 20
+			iArgument += 1
+		elif (strArgument == "--cache"):
+			if (iArgument == len(sys.argv)):
+				print ('--cache must be followed by a directory.')
+				sys.exit()
+			strCacheDir = sys.argv[iArgument]
+			iArgument += 1
+		else:
+			lstArguments.append(strArgument)
+			continue
+		setOptions.add(strArgument)
+	
+	#Export mode: Import_Reg.py --export AdvancedInstallerProjectFile.aip Output.reg ComponentName [ComponentName ...]
+	if (len(lstArguments) > 1 and lstArguments[1] == "--export"):
+		CheckOptions(setOptions, {"--install-path"}, "--export")
+		strProjectFile, strRegFilePath, lstComponents = ReadExportArguments(lstArguments)
+		iWritten, iSkipped = ExportRegistryRows(strProjectFile, lstComponents, strRegFilePath, dictInstallPaths)
+		print ('Exported', iWritten, 'registry entries to', '\"'+strRegFilePath+'\".')
+		if iSkipped:
+			print ('Skipped', iSkipped, 'registry entries whose root is not a registry hive.')
+		return
+	
+	if ("--install-path" in setOptions):
+		print ('--install-path can only be used with --export.')
+		sys.exit()
+	
+	#Batch mode: Import_Reg.py --batch Manifest.json AdvancedInstallerProjectFile.aip [Jobs]
+	#The number of worker processes is given by Jobs, not by --jobs.
+	if (len(lstArguments) > 1 and lstArguments[1] == "--batch"):
+		lstConfigs, strProjectFile, iBatchJobs = ReadBatchArguments(lstArguments)
+		if bDiff:
+			CheckOptions(setOptions, {"--diff", "--cache", "--cache-size"}, "--batch --diff")
+		elif bWatch:
+			CheckOptions(setOptions, {"--watch", "--remove-stale"}, "--batch --watch")
+			RegistryWatcher(lstConfigs, strProjectFile).Run(bRemoveStale)
+			return
+		else:
+			CheckOptions(setOptions, {"--remove-stale", "--cache", "--cache-size", "--stats", "--stats-json"}, "--batch")
+		for config in lstConfigs:
+			config.strCacheDir = strCacheDir
+			config.iCacheSize = iCacheSize
+		if bDiff:
+			lstRegistryEntries = list(itertools.chain.from_iterable(ParseRegistryBatch(lstConfigs, iBatchJobs)))
+			iDifferences = PrintRegistryDiff(DiffRegistryEntries(lstRegistryEntries, strProjectFile, set(config.strComponentName for config in lstConfigs)))
+			print (iDifferences, 'differences between', '\"'+lstArguments[2]+'\"', 'and', '\"'+strProjectFile+'\".')
+			if iDifferences:
+				sys.exit(1)
+			return
+		stats = RegistryImportStats() if strStats else None
+		ImportRegistryBatch(lstConfigs, strProjectFile, iBatchJobs, bRemoveStale, stats)
+		PrintStats(stats, strStats)
+		return
+	
+	if bDiff:
+		CheckOptions(setOptions, {"--diff", "--jobs", "--cache", "--cache-size"}, "--diff")
+	elif bWatch:
+		CheckOptions(setOptions, {"--watch", "--remove-stale"}, "--watch")
+	
+	config = ReadArguments(lstArguments)
+	lstConfigs = [config] + ReadTargetArguments(lstArguments)
+	for targetConfig in lstConfigs:
+		targetConfig.bRemoveStale = bRemoveStale
+		targetConfig.iJobs = iJobs
+		targetConfig.strCacheDir = strCacheDir
+		targetConfig.iCacheSize = iCacheSize
+	if bDiff:
+		lstRegistryEntries = list(itertools.chain.from_iterable(ParseRegistryImportGroup(lstConfigs)))
+		iDifferences = PrintRegistryDiff(DiffRegistryEntries(lstRegistryEntries, config.strProjectFile, set(targetConfig.strComponentName for targetConfig in lstConfigs)))
+		print (iDifferences, 'differences between', '\"'+config.strRegFilePath+'\"', 'and', '\"'+config.strProjectFile+'\".')
+		if iDifferences:
+			sys.exit(1)
+		return
+	if bWatch:
+		RegistryWatcher(lstConfigs, config.strProjectFile).Run(bRemoveStale)
+		return
+	
+	#Several targets: the registry file is parsed once, and the registry entries of every target are inserted with a single rewrite of the AI project file.
+	#--jobs splits the registry file between processes, the same as for a single target (see ParseRegistryFileTargets).
+	if (len(lstConfigs) > 1):
+		stats = RegistryImportStats() if strStats else None
+		ImportRegistryBatch(lstConfigs, config.strProjectFile, 1, bRemoveStale, stats)
+		PrintStats(stats, strStats)
+		return
+	
+	importer = RegistryImporter(config, RegistryImportStats() if strStats else None)
+
+	#Parse registry file and create RegistryEntryAI object that represent registry entries being inserted into the AI project.
+	lstRegistryEntries = importer.Parse()
+
+	#Print what will be inserted into the AI project file. 
+	#Uncomment this for debugging/troubleshooting.
+	# for i in importer.Format(lstRegistryEntries):
+		# print ("    " + i)
+
+	#Format the RegistryEntryAI objects into XML formatted to AI's standards, and insert the XML into the AI project file.
+	importer.Insert(lstRegistryEntries)
+	
+	PrintStats(importer.stats, strStats)
 
-#Print what will be inserted into the AI project file. 
-#Uncomment this for debugging/troubleshooting.
-# for i in lstRegistryXMLEntries:
-	# print ("    " + i)
+	#print ("Finished")
 
-#Insert the XML into the AI project file.	
-InsertRegistryEntries(lstRegistryXMLEntries)
 
-#print ("Finished")
+if __name__ == "__main__":
+	main()
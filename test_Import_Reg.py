@@ -0,0 +1,234 @@
+#Tests of Import_Reg_Public.py.
+#Usage: python -m unittest test_Import_Reg
+
+import io
+import os
+import random
+import tempfile
+import unittest
+import xml.etree.ElementTree as ET
+
+import Import_Reg_Public as ImportReg
+
+
+#Create iCount registry entries with the strings that are hard to write in XML: every character that has to be escaped, character references that must not be unescaped,
+#AI escapes, non-ASCII characters, and keys without a name or a value.
+def GenerateXmlEntries(iCount, iSeed=3):
+
+	rand = random.Random(iSeed)
+	lstPieces = ["&", "<", ">", "\"", "'", "\n", "\r\n", "\t", "&amp;", "&#10;", "&gt;", "&quot;", "[\\[]", "[~]", "\\\\", "é", "中", "\U0001f600", "]]>", "Tools", " "]
+	lstRegistryEntries = []
+	for i in range(iCount):
+		CurrentRegistryEntry = ImportReg.RegistryEntryAI()
+		CurrentRegistryEntry.strRegistry = "My&Component_%d" % (i + 1)
+		CurrentRegistryEntry.strRoot = rand.choice((0, 1, 2, 3, 5))
+		CurrentRegistryEntry.strKey = "CLSID\\" + "".join(rand.choice(lstPieces) for _ in range(rand.randrange(4)))
+		CurrentRegistryEntry.strName = rand.choice(("", "+", "Name", "".join(rand.choice(lstPieces) for _ in range(rand.randrange(1, 4)))))
+		CurrentRegistryEntry.strValue = "" if CurrentRegistryEntry.strName == "+" else "".join(rand.choice(lstPieces) for _ in range(rand.randrange(6)))
+		CurrentRegistryEntry.strComponent = "My&Component"
+		lstRegistryEntries.append(CurrentRegistryEntry)
+
+	return lstRegistryEntries
+
+
+#The attributes the ROW of a registry entry should have, once it's parsed.
+def GetExpectedAttributes(CurrentRegistryEntry):
+
+	dictAttributes = {"Registry": CurrentRegistryEntry.strRegistry, "Root": str(CurrentRegistryEntry.strRoot), "Key": CurrentRegistryEntry.strKey, "Component_": CurrentRegistryEntry.strComponent}
+	if (CurrentRegistryEntry.strName != ""):
+		dictAttributes["Name"] = CurrentRegistryEntry.strName
+	if (CurrentRegistryEntry.strName != "+"):
+		dictAttributes["Value"] = CurrentRegistryEntry.strValue
+	return dictAttributes
+
+
+class TestWriteRegistryRows(unittest.TestCase):
+
+	#Every ROW written by WriteRegistryRows must parse with ElementTree, on its own line, back to the attributes of its registry entry.
+	#The attributes read back by UnescapeXmlAttribute (as InsertRegistryEntries reads the project file) must be the same.
+	def test_ElementTreeRoundTrip(self):
+		lstRegistryEntries = GenerateXmlEntries(5000)
+		bytesIO = io.BytesIO()
+		bytesIO.write(b"<MsiRegsComponent>\n")
+		ImportReg.WriteRegistryRows(bytesIO, lstRegistryEntries, "    ", "\n", 100)
+		bytesIO.write(b"</MsiRegsComponent>\n")
+
+		lstLines = bytesIO.getvalue().split(b"\n")[1:-2]
+		lstElements = list(ET.fromstring(bytesIO.getvalue()))
+		self.assertEqual(len(lstLines), len(lstRegistryEntries))
+		self.assertEqual(len(lstElements), len(lstRegistryEntries))
+		for CurrentRegistryEntry, element, bytesLine in zip(lstRegistryEntries, lstElements, lstLines):
+			dictAttributes = GetExpectedAttributes(CurrentRegistryEntry)
+			dictLineAttributes = {bytesName.decode("utf-8"): ImportReg.UnescapeXmlAttribute(bytesValue) for bytesName, bytesValue in ImportReg.patternXmlAttribute.findall(bytesLine)}
+			self.assertEqual(element.tag, "ROW")
+			self.assertEqual(element.attrib, dictAttributes, bytesLine)
+			self.assertEqual(dictLineAttributes, dictAttributes, bytesLine)
+
+	#Values that don't need escaping are written as they always were, ">" included.
+	def test_UnescapedCharacters(self):
+		CurrentRegistryEntry = ImportReg.RegistryEntryAI()
+		CurrentRegistryEntry.strRegistry = "MyComponent_1"
+		CurrentRegistryEntry.strRoot = 2
+		CurrentRegistryEntry.strKey = "Software\\[Manufacturer]\\[ProductName]"
+		CurrentRegistryEntry.strName = "Path"
+		CurrentRegistryEntry.strValue = "[APPDIR]x -> y 'z'"
+		CurrentRegistryEntry.strComponent = "MyComponent"
+		self.assertEqual(ImportReg.FormatRegistryObject(CurrentRegistryEntry), "<ROW Registry=\"MyComponent_1\" Root=\"2\" Key=\"Software\\[Manufacturer]\\[ProductName]\" Name=\"Path\" Value=\"[APPDIR]x -> y 'z'\" Component_=\"MyComponent\"/>")
+
+	#Escaped characters are written the same way AI writes them.
+	def test_EscapedCharacters(self):
+		self.assertEqual(ImportReg.EscapeXmlAttribute("a&b<c>d\"e\r\n\tf"), "a&amp;b&lt;c>d&quot;e&#13;&#10;&#9;f")
+		self.assertEqual(ImportReg.UnescapeXmlAttribute(b"a&amp;b&lt;c&gt;d&quot;e&#13;&#xA;&#9;f"), "a&b<c>d\"e\r\n\tf")
+
+
+#An AI project file with a MsiRegsComponent table. strRows are the ROWs of the table, one per line.
+strProjectTemplate = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<DOCUMENT Type="Advanced Installer" CreateVersion="12.0" version="12.0" Modules="professional" RootPath="." Language="en">
+  <COMPONENT cid="caphyon.advinst.msicomp.MsiRegsComponent">
+{strRows}  </COMPONENT>
+  <COMPONENT cid="caphyon.advinst.msicomp.MsiCompsComponent">
+    <ROW Component="MyComponent" ComponentId="{{AAAAAAAA-2222-3333-4444-555555555555}}" Directory_="APPDIR" Attributes="0"/>
+  </COMPONENT>
+</DOCUMENT>
+"""
+
+#A ROW of another component, that an import must never change.
+strOtherRow = "    <ROW Registry=\"Comments\" Root=\"-1\" Key=\"Software\\[ProductName]\" Name=\"Comments\" Value=\"[ARPCOMMENTS]\" Component_=\"OtherComponent\"/>\n"
+
+
+#Imports into a small AI project file, in a temporary directory.
+class ImportTestCase(unittest.TestCase):
+
+	def setUp(self):
+		self.tempDir = tempfile.TemporaryDirectory()
+		self.strProjectFile = os.path.join(self.tempDir.name, "MyAIProject.aip")
+		self.strRegFilePath = os.path.join(self.tempDir.name, "MyFile.reg")
+
+	def tearDown(self):
+		self.tempDir.cleanup()
+
+	#Write the AI project file, with strRows in its MsiRegsComponent table.
+	def WriteProject(self, strRows=strOtherRow):
+		with open(self.strProjectFile, "w", encoding="utf-8", newline="") as projectHandle:
+			projectHandle.write(strProjectTemplate.format(strRows=strRows))
+
+	def ReadProject(self):
+		with open(self.strProjectFile, "rb") as projectHandle:
+			return projectHandle.read()
+
+	#Write a registry file with the values of dictValues (name -> data) under a single key, and import it into MyComponent.
+	def Import(self, dictValues, bRemoveStale=False):
+		with open(self.strRegFilePath, "w", encoding="utf-8", newline="") as regFileHandle:
+			regFileHandle.write("Windows Registry Editor Version 5.00\r\n\r\n[HKEY_CURRENT_USER\\Software\\MyProduct]\r\n")
+			for strName, strData in dictValues.items():
+				regFileHandle.write("\"" + strName + "\"=" + strData + "\r\n")
+			regFileHandle.write("\r\n")
+		importer = ImportReg.RegistryImporter(ImportReg.RegistryImportConfig(self.strRegFilePath, self.strProjectFile, "MyComponent", bRemoveStale=bRemoveStale))
+		self.assertTrue(importer.Insert(importer.Parse()))
+
+	#The (Registry, Name, Value) of every ROW of a component, in file order.
+	def GetRows(self, strComponent="MyComponent"):
+		return [(CurrentRegistryEntry.strRegistry, CurrentRegistryEntry.strName, CurrentRegistryEntry.strValue) for CurrentRegistryEntry in ImportReg.ReadRegistryRows(self.strProjectFile, {strComponent})]
+
+
+class TestReimport(ImportTestCase):
+
+	#Importing the same registry file again leaves the project file as it is.
+	def test_ReimportUnchanged(self):
+		self.WriteProject()
+		self.Import({"A": "\"1\"", "B": "dword:00000002"})
+		bytesProject = self.ReadProject()
+		self.Import({"A": "\"1\"", "B": "dword:00000002"})
+		self.assertEqual(self.ReadProject(), bytesProject)
+
+	#Only the ROWs whose value changed are rewritten. They keep their identifier and their place, and new values are added after them.
+	def test_ChangedValues(self):
+		self.WriteProject()
+		self.Import({"A": "\"1\"", "B": "\"2\"", "C": "\"3\""})
+		bytesProject = self.ReadProject()
+		self.Import({"A": "\"1\"", "B": "\"changed\"", "C": "\"3\"", "D": "\"4\""})
+		self.assertEqual(self.GetRows(), [("MyComponent_1", "A", "1"), ("MyComponent_2", "B", "changed"), ("MyComponent_3", "C", "3"), ("MyComponent_4", "D", "4")])
+		#Every other line of the project file is the same.
+		lstOldLines = bytesProject.split(b"\n")
+		lstNewLines = self.ReadProject().split(b"\n")
+		self.assertEqual([bytesLine for bytesLine in lstNewLines if b"\"changed\"" not in bytesLine and b"Name=\"D\"" not in bytesLine], [bytesLine for bytesLine in lstOldLines if b"Name=\"B\"" not in bytesLine])
+
+	#Without --remove-stale, values that are not in the registry file anymore are kept.
+	def test_KeepStale(self):
+		self.WriteProject()
+		self.Import({"A": "\"1\"", "B": "\"2\""})
+		self.Import({"A": "\"1\""})
+		self.assertEqual([strName for strRegistry, strName, strValue in self.GetRows()], ["A", "B"])
+
+	#--remove-stale only removes the stale ROWs of the imported component.
+	def test_RemoveStale(self):
+		self.WriteProject()
+		self.Import({"A": "\"1\"", "B": "\"2\"", "C": "\"3\""})
+		self.Import({"A": "\"1\"", "C": "\"3\""}, True)
+		self.assertEqual(self.GetRows(), [("MyComponent_1", "A", "1"), ("MyComponent_3", "C", "3")])
+		self.assertIn(strOtherRow.encode("utf-8"), self.ReadProject())
+
+
+
+class TestRegistryIds(ImportTestCase):
+
+	#Identifiers continue after the highest suffix of the prefix in the project file, even if another component holds it.
+	def test_ContinueAfterHighestSuffix(self):
+		self.WriteProject(strOtherRow
+			+ "    <ROW Registry=\"MyComponent_3\" Root=\"1\" Key=\"Software\\Old\" Name=\"Old\" Value=\"1\" Component_=\"MyComponent\"/>\n"
+			+ "    <ROW Registry=\"MyComponent_12\" Root=\"1\" Key=\"Software\\Other\" Name=\"Other\" Value=\"1\" Component_=\"OtherComponent\"/>\n"
+			+ "    <ROW Registry=\"MyComponent_x7\" Root=\"1\" Key=\"Software\\Other\" Name=\"NotANumber\" Value=\"1\" Component_=\"OtherComponent\"/>\n")
+		self.Import({"A": "\"1\"", "B": "\"2\""})
+		self.assertEqual(self.GetRows(), [("MyComponent_3", "Old", "1"), ("MyComponent_13", "A", "1"), ("MyComponent_14", "B", "2")])
+
+	#Several imports into the same project file in one process never give out an identifier twice.
+	def test_SeveralImports(self):
+		self.WriteProject()
+		self.Import({"A": "\"1\""})
+		self.Import({"A": "\"1\"", "B": "\"2\""})
+		self.Import({"C": "\"3\""})
+		self.assertEqual(self.GetRows(), [("MyComponent_1", "A", "1"), ("MyComponent_2", "B", "2"), ("MyComponent_3", "C", "3")])
+
+	#A project file that is changed outside of the import (ex: restored from source control) is scanned again, so the same build gives the same identifiers.
+	def test_ProjectReplaced(self):
+		self.WriteProject()
+		self.Import({"A": "\"1\"", "B": "\"2\""})
+		bytesProject = self.ReadProject()
+		self.WriteProject()
+		self.Import({"A": "\"1\"", "B": "\"2\""})
+		self.assertEqual(self.ReadProject(), bytesProject)
+
+	#Format() gives the identifiers Insert() will give, without writing the project file.
+	def test_FormatIds(self):
+		self.WriteProject()
+		self.Import({"A": "\"1\""})
+		bytesProject = self.ReadProject()
+		importer = ImportReg.RegistryImporter(ImportReg.RegistryImportConfig(self.strRegFilePath, self.strProjectFile, "MyComponent"))
+		with open(self.strRegFilePath, "a", encoding="utf-8", newline="") as regFileHandle:
+			regFileHandle.write("[HKEY_CURRENT_USER\\Software\\MyProduct]\r\n\"B\"=\"2\"\r\n\r\n")
+		lstRows = list(importer.Format(importer.Parse()))
+		self.assertEqual(self.ReadProject(), bytesProject)
+		self.assertEqual([strRow.split("\"")[1] for strRow in lstRows], ["MyComponent_1", "MyComponent_2"])
+
+
+
+class TestExport(ImportTestCase):
+
+	#A registry file exported from the project file has no differences with it, and importing it again doesn't change the project file.
+	def test_ExportDiffRoundTrip(self):
+		self.WriteProject()
+		self.Import({"Bin": "hex:0A,ff,01,02", "Word": "dword:0000000a", "Path": "\"C:\\\\Program Files\\\\MyProduct\\\\My.exe\"", "Text": "\"[x] {y} \\\"z\\\"\""})
+		bytesProject = self.ReadProject()
+		
+		strExportPath = os.path.join(self.tempDir.name, "Exported.reg")
+		self.assertEqual(ImportReg.ExportRegistryRows(self.strProjectFile, ["MyComponent"], strExportPath, {"[APPDIR]": "C:\\Program Files\\MyProduct"}), (4, 0))
+		importer = ImportReg.RegistryImporter(ImportReg.RegistryImportConfig(strExportPath, self.strProjectFile, "MyComponent"))
+		lstRegistryEntries = importer.Parse()
+		self.assertEqual(list(ImportReg.DiffRegistryEntries(lstRegistryEntries, self.strProjectFile)), [])
+		
+		self.assertTrue(importer.Insert(lstRegistryEntries))
+		self.assertEqual(self.ReadProject(), bytesProject)
+
+
+if __name__ == "__main__":
+	unittest.main()